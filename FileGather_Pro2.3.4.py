@@ -2,21 +2,48 @@ import sys
 import shutil
 import datetime
 import re
+import functools
+import itertools
 import traceback
 import threading
+import time
 import base64  # 用于嵌入图标
 import os
+import multiprocessing
+import sqlite3
+import zlib
+import hashlib
+import codecs
+import mmap
+import html
+import importlib
+import zipfile
+import tarfile
+import gzip
+import bz2
+import lzma
+import io
+import contextlib
+import errno
+import json
+from xml.etree import ElementTree
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque, OrderedDict
+from array import array
 from pathlib import Path
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QLineEdit, QPushButton, QComboBox, QCheckBox, QGroupBox, QFileDialog,
-    QMessageBox, QTreeWidget, QTreeWidgetItem, QProgressBar, QDialog,
-    QDialogButtonBox, QListWidget, QListWidgetItem, QAbstractItemView,
+    QMessageBox, QTreeView, QProgressBar, QDialog,
+    QDialogButtonBox, QListWidget, QListView, QAbstractItemView,
     QScrollArea, QMenu, QAction, QInputDialog,
-    QRadioButton, QButtonGroup, QHeaderView
+    QRadioButton, QButtonGroup, QHeaderView, QSpinBox
 )
 from PyQt5.QtGui import QIcon, QColor, QPalette, QLinearGradient, QBrush, QFont, QPixmap, QPainter
-from PyQt5.QtCore import Qt, QPoint, QByteArray
+from PyQt5.QtCore import (
+    Qt, QPoint, QByteArray, QThread, QTimer, pyqtSignal, QAbstractTableModel, QAbstractListModel, QModelIndex
+)
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet
@@ -43,14 +70,3416 @@ def register_multilingual_fonts():
         except Exception as e:
             print(f"注册字体 {font_name} 时出错: {str(e)}")
 
-    if not pdfmetrics.getRegisteredFontNames():
-        try:
-            pdfmetrics.registerFont(TTFont('Vera', 'Vera.ttf'))
-            print("使用 ReportLab 默认字体 Vera")
-        except:
-            pass
+    if not pdfmetrics.getRegisteredFontNames():
+        try:
+            pdfmetrics.registerFont(TTFont('Vera', 'Vera.ttf'))
+            print("使用 ReportLab 默认字体 Vera")
+        except:
+            pass
+
+# 关键词查询编译
+class MultiPatternMatcher:
+    """一次扫描文本即可找出多个关键词中的哪些出现过，耗时随文本长度增长而与关键词数量基本无关
+
+    安装了 pyahocorasick 时使用 Aho-Corasick 自动机；否则把所有关键词合并成一个按前缀树
+    组织的正则表达式，在每个位置取最长匹配，再通过"被包含关系"补全更短的关键词。
+    关键词和待匹配文本都应已转为小写。
+    """
+
+    def __init__(self, terms):
+        self.terms = tuple(terms)
+        self._automaton = None
+        self._pattern = None
+        try:
+            import ahocorasick
+            automaton = ahocorasick.Automaton()
+            for index, term in enumerate(self.terms):
+                automaton.add_word(term, index)
+            automaton.make_automaton()
+            self._automaton = automaton
+        except ImportError:
+            trie_regex = self._trie_regex(self.terms)
+            self._pattern = re.compile(trie_regex)
+            # 某个关键词出现时，它包含的其他关键词必然也出现
+            self._contained = [
+                tuple(j for j, other in enumerate(self.terms) if j != i and other in term)
+                for i, term in enumerate(self.terms)
+            ]
+            self._index = {term: i for i, term in enumerate(self.terms)}
+
+    @staticmethod
+    def _trie_regex(terms):
+        trie = {}
+        for term in terms:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        def build(node):
+            alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not alternatives:
+                return ""
+            if len(alternatives) == 1 and "" not in node:
+                return alternatives[0]
+            group = "(?:" + "|".join(alternatives) + ")"
+            # 可选分组为贪婪匹配，同一位置优先匹配更长的关键词
+            return group + "?" if "" in node else group
+
+        return build(trie)
+
+    def contains_any(self, text):
+        """文本中是否至少出现一个关键词，找到第一个即返回"""
+        if self._automaton is not None:
+            for _ in self._automaton.iter(text):
+                return True
+            return False
+        return self._pattern.search(text) is not None
+
+    def find_all(self, text):
+        """返回文本中出现过的关键词下标集合"""
+        found = set()
+        if self._automaton is not None:
+            for _, index in self._automaton.iter(text):
+                found.add(index)
+            return found
+        # 每次从上一个匹配起点的下一个字符继续查找，这样相互重叠的关键词也不会漏掉
+        index_of = self._index
+        search = self._pattern.search
+        match = search(text)
+        while match is not None:
+            found.add(index_of[match.group()])
+            match = search(text, match.start() + 1)
+        for index in list(found):
+            found.update(self._contained[index])
+        return found
+
+
+class KeywordMatcher:
+    """编译后的关键词查询，创建后不可修改
+
+    exact 为引号中的精确短语，must_include/must_exclude/any_include 分别对应
+    "+词"、"-词" 和普通词或 "a|b" 形式的任一匹配，所有词均已转为小写。
+    关键词数量达到 MULTI_PATTERN_THRESHOLD 时改用 MultiPatternMatcher 一次扫描完成匹配。
+    """
+    __slots__ = ("exact", "must_include", "must_exclude", "any_include", "_multi", "_required",
+                 "_excluded", "_optional", "_always_any", "_never")
+
+    MULTI_PATTERN_THRESHOLD = 8
+
+    def __init__(self, exact=(), must_include=(), must_exclude=(), any_include=()):
+        exact = tuple(exact)
+        must_include = tuple(must_include)
+        must_exclude = tuple(must_exclude)
+        any_include = tuple(any_include)
+        object.__setattr__(self, "exact", exact)
+        object.__setattr__(self, "must_include", must_include)
+        object.__setattr__(self, "must_exclude", must_exclude)
+        object.__setattr__(self, "any_include", any_include)
+
+        multi = None
+        terms = tuple(dict.fromkeys(t for t in exact + must_include + must_exclude + any_include if t))
+        if len(terms) >= self.MULTI_PATTERN_THRESHOLD:
+            multi = MultiPatternMatcher(terms)
+            index = {term: i for i, term in enumerate(terms)}
+            # 空词在任何文本中都"出现"，单独处理
+            object.__setattr__(self, "_required", frozenset(index[t] for t in exact + must_include if t))
+            object.__setattr__(self, "_excluded", frozenset(index[t] for t in must_exclude if t))
+            object.__setattr__(self, "_optional", frozenset(index[t] for t in any_include if t))
+            object.__setattr__(self, "_always_any", "" in any_include)
+            object.__setattr__(self, "_never", "" in must_exclude)
+        object.__setattr__(self, "_multi", multi)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("KeywordMatcher 不可修改")
+
+    def __bool__(self):
+        return bool(self.exact or self.must_include or self.must_exclude or self.any_include)
+
+    def term_count(self):
+        return len(self.exact) + len(self.must_include) + len(self.must_exclude) + len(self.any_include)
+
+    def matches(self, text):
+        # 每段文本只转换一次小写
+        text = text.lower()
+        if self._multi is not None:
+            return self._matches_multi(text)
+        for term in self.exact:
+            if term not in text:
+                return False
+        for term in self.must_include:
+            if term not in text:
+                return False
+        for term in self.must_exclude:
+            if term in text:
+                return False
+        if self.any_include:
+            for term in self.any_include:
+                if term in text:
+                    return True
+            return False
+        return True
+
+    def stream(self):
+        """返回逐段匹配用的 StreamMatch"""
+        return StreamMatch(self)
+
+    def _matches_multi(self, text):
+        if self._never:
+            return False
+        if not self._required and not self._excluded:
+            # 只有"任一"关键词时找到第一个就可以结束
+            return self._always_any or self._multi.contains_any(text)
+        found = self._multi.find_all(text)
+        if not self._required <= found:
+            return False
+        if self._excluded & found:
+            return False
+        if self.any_include and not self._always_any:
+            return bool(self._optional & found)
+        return True
+
+
+class StreamMatch:
+    """把文本分段依次交给 feed()，逐段判断是否与 KeywordMatcher 匹配
+
+    相邻两段之间保留"最长关键词长度 - 1"个字符的重叠，跨段出现的关键词也能找到。
+    结果已经确定时 feed() 返回 True/False，调用方可以停止读取；否则返回 None，
+    全部读完后调用 finish() 得到最终结果。
+    """
+
+    def __init__(self, matcher):
+        self._multi = matcher._multi
+        self._required = frozenset(matcher.exact + matcher.must_include)
+        self._excluded = frozenset(matcher.must_exclude)
+        self._optional = frozenset(matcher.any_include)
+        terms = self._required | self._excluded | self._optional
+        self._remaining = [t for t in terms if t]
+        self._overlap = max((len(t) for t in self._remaining), default=1) - 1
+        self._found = {""}  # 空词在任何文本中都"出现"
+        self._tail = ""
+        self.result = None
+        self._decide()
+
+    def feed(self, chunk):
+        if self.result is not None:
+            return self.result
+        text = self._tail + chunk.lower()
+        if self._multi is not None:
+            terms = self._multi.terms
+            self._found.update(terms[i] for i in self._multi.find_all(text))
+        else:
+            self._found.update(t for t in self._remaining if t in text)
+        self._remaining = [t for t in self._remaining if t not in self._found]
+        self._tail = text[max(0, len(text) - self._overlap):] if self._overlap else ""
+        return self._decide()
+
+    def finish(self):
+        if self.result is None:
+            self._decide(final=True)
+        return self.result
+
+    def _decide(self, final=False):
+        found = self._found
+        if self._excluded & found:
+            self.result = False
+        elif self._required <= found and (not self._optional or self._optional & found):
+            # 还有排除词没有出现时，要读完全文才能确定匹配
+            if final or self._excluded <= found:
+                self.result = True
+        elif final:
+            self.result = False
+        return self.result
+
+
+MATCH_ALL = KeywordMatcher()
+
+
+@functools.lru_cache(maxsize=64)
+def compile_keyword(keyword):
+    """把 "+必须 -排除 a|b \"精确\"" 语法解析成 KeywordMatcher，同一查询只解析一次"""
+    if not keyword:
+        return MATCH_ALL
+
+    exact_matches = re.findall(r'"([^"]*)"', keyword)
+    exact = []
+    for phrase in exact_matches:
+        exact.append(phrase.lower())
+        keyword = keyword.replace(f'"{phrase}"', '')
+
+    must_include = []
+    must_exclude = []
+    any_include = []
+    for token in re.split(r'\s+', keyword.strip()):
+        if not token:
+            continue
+        if token.startswith('+'):
+            must_include.append(token[1:].lower())
+        elif token.startswith('-'):
+            must_exclude.append(token[1:].lower())
+        elif '|' in token:
+            any_include.extend(t.lower() for t in token.split('|'))
+        else:
+            any_include.append(token.lower())
+
+    return KeywordMatcher(exact, must_include, must_exclude, any_include)
+
+# 基于 os.scandir 的目录遍历
+QUARANTINE_DIR_NAME = ".FileGatherPro-quarantine"  # 隔离区文件夹，搜索和索引时跳过
+
+
+def list_directory(path):
+    """列出一个目录，返回 (文件 DirEntry 列表, 子目录 DirEntry 列表)，不包含符号链接目录和隔离区"""
+    files = []
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != QUARANTINE_DIR_NAME:
+                        subdirs.append(entry)
+                elif entry.is_file():
+                    files.append(entry)
+            except OSError:
+                continue
+    return files, subdirs
+
+
+def scan_directory(folder, recursive=True):
+    """逐个目录产出 (目录路径, 文件 DirEntry 列表, 子目录 DirEntry 列表)
+
+    目录项的类型来自 scandir 本身的结果，文件大小和修改时间由调用方按需通过
+    entry.stat() 获取（Windows 上直接复用目录列表中的数据，其他系统只需一次 stat），
+    不再对每个文件额外调用 exists()/os.access()。与 os.walk 一样不进入符号链接目录，
+    无法访问的目录会被跳过。
+    """
+    pending = [folder]
+    while pending:
+        root = pending.pop()
+        try:
+            files, subdirs = list_directory(root)
+        except OSError as e:
+            print(f"访问文件夹出错: {root} - {str(e)}")
+            continue
+
+        yield root, files, subdirs
+
+        if recursive:
+            # 逆序压栈，保证子目录按列表顺序被访问
+            pending.extend(entry.path for entry in reversed(subdirs))
+
+# 文件元数据索引
+def get_cache_dir():
+    """程序缓存目录（索引、内容缓存等），不存在时自动创建"""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "FileGatherPro")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class IndexedEntry:
+    """索引中的一条文件记录，提供与 DirEntry 相同的 name/path/stat() 接口"""
+    __slots__ = ("path", "name", "st_size", "st_mtime")
+
+    def __init__(self, path, name, size, mtime):
+        self.path = path
+        self.name = name
+        self.st_size = size
+        self.st_mtime = mtime
+
+    def stat(self):
+        return self
+
+    def refresh(self):
+        """按文件的实际状态更新大小和修改时间"""
+        file_stat = os.stat(self.path)
+        self.st_size = file_stat.st_size
+        self.st_mtime = file_stat.st_mtime
+
+
+class MetadataIndex:
+    """已扫描文件夹的文件元数据索引（SQLite），重复搜索时可以直接查询而不必遍历目录
+
+    除文件记录外还保存每个目录的修改时间和条目数。refresh() 只重新列出修改时间或条目数
+    发生变化的目录，对其中的文件逐行增删改，未变化的目录只需一次 stat。文件内容被修改时
+    所在目录的修改时间不会变化，因此完整遍历超过 FULL_SCAN_AGE 秒的文件夹需要重新遍历。
+    每个线程应使用自己的 MetadataIndex 实例。
+    """
+    FULL_SCAN_AGE = 24 * 60 * 60
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS folders (
+            root TEXT PRIMARY KEY,
+            indexed_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime REAL NOT NULL,
+            entry_count INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            dir TEXT NOT NULL,
+            name TEXT NOT NULL,
+            lname TEXT NOT NULL,
+            ext TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_cache_dir(), "index.sqlite3")
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._dir_mtimes = {}
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def normalize(folder):
+        return os.path.abspath(folder)
+
+    @staticmethod
+    def _path_range(folder):
+        """folder 下所有路径在字符串排序中所处的区间 [low, high)"""
+        low = folder if folder.endswith(os.sep) else folder + os.sep
+        high = low[:-1] + chr(ord(low[-1]) + 1)
+        return low, high
+
+    @staticmethod
+    def _file_row(entry, root):
+        file_stat = entry.stat()
+        name = entry.name
+        return (entry.path, root, name, name.lower(), os.path.splitext(name)[1].lower(),
+                file_stat.st_size, file_stat.st_mtime)
+
+    def indexed_at(self, folder):
+        row = self.conn.execute("SELECT indexed_at FROM folders WHERE root = ?",
+                                (self.normalize(folder),)).fetchone()
+        return row[0] if row else None
+
+    def needs_full_scan(self, folder):
+        """文件夹从未完整遍历过，或距上次完整遍历已超过 FULL_SCAN_AGE"""
+        indexed_at = self.indexed_at(folder)
+        return indexed_at is None or time.time() - indexed_at >= self.FULL_SCAN_AGE
+
+    # 完整遍历：由搜索线程在遍历的同时调用
+    def begin_folder(self, folder):
+        """开始重建某个文件夹的索引，在 finish_folder 提交之前旧数据仍然有效"""
+        folder = self.normalize(folder)
+        self._remove_tree(folder)
+        # 目录的修改时间在列出目录之前获取，列出期间发生的变化会在下次刷新时发现
+        self._dir_mtimes = {folder: os.stat(folder).st_mtime}
+
+    def add_directory(self, root, files, subdirs):
+        """写入一个目录及其中的文件，files/subdirs 为该目录的 DirEntry 列表"""
+        rows = []
+        for entry in files:
+            try:
+                rows.append(self._file_row(entry, root))
+            except OSError:
+                continue
+        self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+        for entry in subdirs:
+            try:
+                self._dir_mtimes[entry.path] = entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+        mtime = self._dir_mtimes.pop(root, None)
+        if mtime is not None:
+            self.conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                              (root, os.path.dirname(root), mtime, len(rows) + len(subdirs)))
+
+    def finish_folder(self, folder):
+        self._dir_mtimes = {}
+        self.conn.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)",
+                          (self.normalize(folder), time.time()))
+        self.conn.commit()
+
+    def abort(self):
+        self._dir_mtimes = {}
+        self.conn.rollback()
+
+    def _remove_tree(self, path):
+        low, high = self._path_range(path)
+        self.conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (low, high))
+        self.conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+    # 增量刷新
+    def refresh(self, folder, cancel_event=None, on_directory=None, full=False, recursive=True):
+        """增量刷新文件夹的索引，返回各项计数
+
+        从文件夹开始逐个 stat 目录：修改时间和条目数都与索引一致的目录直接沿用索引中的
+        子目录继续向下检查；其余目录重新列出，只写入新增、删除或大小/修改时间变化的文件。
+        full 为 True 时重新列出全部目录，完成后记为一次完整遍历。recursive 为 False 时
+        只刷新文件夹本身，不进入子目录。
+        """
+        folder = self.normalize(folder)
+        stats = dict.fromkeys(("checked", "relisted", "added", "updated", "removed"), 0)
+        conn = self.conn
+        try:
+            pending = [(folder, os.stat(folder).st_mtime)]
+        except OSError:
+            self._remove_tree(folder)
+            conn.commit()
+            return stats
+
+        last_commit = time.monotonic()
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            path, mtime = pending.pop()
+            stats["checked"] += 1
+            if on_directory is not None:
+                on_directory(path)
+
+            known_subdirs = [row[0] for row in conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,))]
+            row = None if full else conn.execute(
+                "SELECT mtime, entry_count FROM dirs WHERE path = ?", (path,)).fetchone()
+            if row is not None and row[0] == mtime:
+                file_count = conn.execute("SELECT COUNT(*) FROM files WHERE dir = ?", (path,)).fetchone()[0]
+                if file_count + len(known_subdirs) == row[1]:
+                    for subdir in (known_subdirs if recursive else ()):
+                        try:
+                            pending.append((subdir, os.stat(subdir).st_mtime))
+                        except OSError:
+                            self._remove_tree(subdir)
+                    continue
+
+            try:
+                files, subdirs = list_directory(path)
+            except OSError as e:
+                print(f"访问文件夹出错: {path} - {str(e)}")
+                self._remove_tree(path)
+                continue
+            stats["relisted"] += 1
+            self._update_directory(path, mtime, files, subdirs, known_subdirs, stats)
+            for entry in (subdirs if recursive else ()):
+                try:
+                    pending.append((entry.path, entry.stat(follow_symlinks=False).st_mtime))
+                except OSError:
+                    continue
+
+            # 定期提交，避免长时间占用写锁
+            if time.monotonic() - last_commit > 1.0:
+                conn.commit()
+                last_commit = time.monotonic()
+
+        if full and recursive and not pending:
+            conn.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (folder, time.time()))
+        conn.commit()
+        return stats
+
+    def _update_directory(self, path, mtime, files, subdirs, known_subdirs, stats):
+        conn = self.conn
+        existing = {row[0]: (row[1], row[2]) for row in
+                    conn.execute("SELECT path, size, mtime FROM files WHERE dir = ?", (path,))}
+        changed_rows = []
+        count = 0
+        for entry in files:
+            try:
+                row = self._file_row(entry, path)
+            except OSError:
+                continue
+            count += 1
+            old = existing.pop(entry.path, None)
+            if old is None:
+                stats["added"] += 1
+                changed_rows.append(row)
+            elif old != (row[5], row[6]):
+                stats["updated"] += 1
+                changed_rows.append(row)
+        if changed_rows:
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", changed_rows)
+        if existing:
+            stats["removed"] += len(existing)
+            conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in existing])
+
+        current = {entry.path for entry in subdirs}
+        for subdir in known_subdirs:
+            if subdir not in current:
+                self._remove_tree(subdir)
+        conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                     (path, os.path.dirname(path), mtime, count + len(subdirs)))
+
+
+    def query(self, folder, recursive=True, extensions=None, min_size=0, max_size=float('inf'),
+              min_mtime=None, max_mtime=None, name_matcher=None):
+        """按扩展名、大小、修改时间和文件名关键词查询文件夹下的文件，逐条产出 IndexedEntry
+
+        name_matcher 为 KeywordMatcher 时，关键词条件转换为对小写文件名列 lname 的 instr()
+        判断，与 KeywordMatcher.matches 的结果一致。
+        """
+        folder = self.normalize(folder)
+        if recursive:
+            low, high = self._path_range(folder)
+            conditions = ["path >= ?", "path < ?"]
+            params = [low, high]
+        else:
+            conditions = ["dir = ?"]
+            params = [folder]
+        if extensions is not None:
+            conditions.append(f"ext IN ({','.join('?' * len(extensions))})")
+            params.extend(extensions)
+        if min_size > 0:
+            conditions.append("size >= ?")
+            params.append(min_size)
+        if max_size != float('inf'):
+            conditions.append("size <= ?")
+            params.append(max_size)
+        if min_mtime is not None:
+            conditions.append("mtime >= ? AND mtime < ?")
+            params.extend([min_mtime, max_mtime])
+        if name_matcher:
+            for term in name_matcher.exact + name_matcher.must_include:
+                conditions.append("instr(lname, ?) > 0")
+                params.append(term)
+            for term in name_matcher.must_exclude:
+                conditions.append("instr(lname, ?) = 0")
+                params.append(term)
+            if name_matcher.any_include:
+                conditions.append("(" + " OR ".join(["instr(lname, ?) > 0"] * len(name_matcher.any_include)) + ")")
+                params.extend(name_matcher.any_include)
+        cursor = self.conn.execute(
+            f"SELECT path, name, size, mtime FROM files WHERE {' AND '.join(conditions)} ORDER BY path",
+            params)
+        for path, name, size, mtime in cursor:
+            yield IndexedEntry(path, name, size, mtime)
+
+
+# 内容搜索（模块级函数，可以在子进程中执行）
+TEXT_EXTENSIONS = ('.txt', '.py', '.java', '.cpp', '.h', '.html', '.css', '.js', '.csv', '.ini', '.log')
+CONTENT_PREFIX_LIMIT = 3000      # 快速模式下每个文件最多检查的字符数
+KEEP_TEXT_LIMIT = 1000000        # 需要缓存文本时最多保留的字符数，更长的文件只做流式匹配
+TEXT_CHUNK_SIZE = 64 * 1024      # 文本文件每次读取的字符数
+EXTRACT_VERSION = 3              # 提取逻辑变化时加一，缓存和全文索引中按旧逻辑提取的文本随之作废
+
+
+class BytePrefilter:
+    """文本文件的字节级预过滤：把关键词编码成 UTF-8、GBK 和 latin-1 字节后直接在 mmap 中查找
+
+    只用于排除文件：必须包含的词的字节不存在，或"任一"词的字节全都不存在时文件一定不匹配，
+    其余文件仍需解码后完整匹配。为了使用逐字节比较的 mmap.find，每个词只查找其中最长的
+    一段没有大小写之分的字符（中文、数字、符号等）；全部由字母组成的词无法预过滤。
+    """
+
+    def __init__(self, matcher):
+        self.required = [a for a in map(self._anchor, set(matcher.exact + matcher.must_include)) if a]
+        self.any_include = []
+        anchors = [self._anchor(t) for t in matcher.any_include]
+        if anchors and all(anchors):
+            self.any_include = [v for a in anchors for v in a]
+
+    def __bool__(self):
+        return bool(self.required or self.any_include)
+
+    @staticmethod
+    def _anchor(term):
+        """返回词中最长一段无大小写字符的各种编码形式，没有这样的字符时返回空列表"""
+        runs = ["".join(run) for caseless, run in
+                itertools.groupby(term, key=lambda ch: ch.lower() == ch.upper()) if caseless]
+        if not runs:
+            return []
+        anchor = max(runs, key=len)
+        # 先查找更常见的 UTF-8 形式，找到即可停止
+        variants = [anchor.encode('utf-8')]
+        for encoding in ('gb18030', 'latin-1'):
+            try:
+                encoded = anchor.encode(encoding)
+            except UnicodeEncodeError:
+                continue
+            if encoded not in variants:
+                variants.append(encoded)
+        return variants
+
+    def may_match(self, data, endpos):
+        for variants in self.required:
+            if all(data.find(v, 0, endpos) < 0 for v in variants):
+                return False
+        return not self.any_include or any(data.find(v, 0, endpos) >= 0 for v in self.any_include)
+
+
+@functools.lru_cache(maxsize=64)
+def compile_byte_prefilter(keyword):
+    """同一查询在每个进程中只构建一次 BytePrefilter，无法用于排除文件时返回 None"""
+    prefilter = BytePrefilter(compile_keyword(keyword))
+    return prefilter if prefilter else None
+
+
+def text_may_match(file_path, keyword, limit=None):
+    """用 mmap 对文本文件做字节级预过滤，返回 False 时文件一定不匹配"""
+    prefilter = compile_byte_prefilter(keyword)
+    if prefilter is None:
+        return True
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return True
+        # UTF-16/32 编码的文件无法按字节预过滤
+        if bom_encoding(f.read(4)) in ('utf-16', 'utf-32'):
+            return True
+        # 快速模式只检查开头部分，每个字符最多占 4 个字节
+        endpos = min(size, limit * 4) if limit else size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return prefilter.may_match(data, endpos)
+
+
+def scan_content(file_path, keyword, limit=None, keep_limit=0, prefilter=True):
+    """流式匹配文件内容，返回 (是否匹配, 文本, 文本是否完整)，不支持的格式或解析失败时返回 None
+
+    limit 为最多检查的字符数（快速模式），None 表示检查全文。keep_limit 大于 0 时同时保留
+    读到的文本供缓存使用，文本超过 keep_limit 后不再保留，返回的文本为 None。
+    结果确定且不需要保留文本时立即停止读取。prefilter 为 True 时文本文件先经过 text_may_match
+    字节级预过滤，一定不匹配的文件不再解码，也就没有文本可以写入缓存或全文索引。
+    解析时间超过提取器的 timeout 时放弃该文件。
+    """
+    extractor = get_extractor(file_path)
+    if extractor is None:
+        return None
+    try:
+        path = str(file_path)
+        if is_archive_member(path):
+            # 压缩包成员不写临时文件：文本直接读解压流，其他格式读入内存供解析库随机访问
+            is_text = isinstance(extractor, TextExtractor)
+            with open_archive_member(path, seekable=not is_text) as source:
+                return _scan_chunks(extractor, source, path, keyword, limit, keep_limit)
+        if prefilter and isinstance(extractor, TextExtractor) and not text_may_match(file_path, keyword, limit):
+            return False, None, True
+        return _scan_chunks(extractor, file_path, path, keyword, limit, keep_limit)
+
+    except Exception as e:
+        print(f"内容搜索失败: {file_path} - {str(e)}")
+        return None
+
+
+def _scan_chunks(extractor, source, file_path, keyword, limit, keep_limit):
+    chunk_size = min(TEXT_CHUNK_SIZE, limit) if limit else TEXT_CHUNK_SIZE
+    chunks = extractor.iter_text(source, chunk_size)
+    if chunks is None:
+        return None
+    deadline = time.monotonic() + extractor.timeout
+    stream = compile_keyword(keyword).stream()
+    kept = [] if keep_limit else None
+    kept_size = 0
+    read = 0
+    complete = True
+    try:
+        for chunk in chunks:
+            if limit is not None and read + len(chunk) > limit:
+                chunk = chunk[:limit - read]
+                complete = False
+            read += len(chunk)
+            if kept is not None:
+                kept.append(chunk)
+                kept_size += len(chunk)
+                if kept_size > keep_limit:
+                    kept = None
+            if (stream.feed(chunk) is not None and kept is None) or not complete:
+                complete = False
+                break
+            if time.monotonic() > deadline:
+                print(f"内容搜索超时，已跳过: {file_path}")
+                return None
+    finally:
+        chunks.close()
+    text = "".join(kept) if kept is not None else None
+    return stream.finish(), text, complete
+
+
+def search_content(file_path, keyword, limit=None):
+    result = scan_content(file_path, keyword, limit)
+    return result is not None and result[0]
+
+
+def extract_content(file_path, limit=CONTENT_PREFIX_LIMIT):
+    """提取文件开头最多 limit 个字符的文本（limit 为 None 时提取全文），失败时返回 None"""
+    result = scan_content(file_path, "", limit, float('inf'))
+    return result[1] if result is not None else None
+
+
+ENCODING_SNIFF_SIZE = 64 * 1024   # 检测编码时读取的开头字节数
+ENCODING_CACHE_SIZE = 4096        # 每个进程缓存的文件编码数
+_ENCODING_CACHE = OrderedDict()   # 路径 -> ((大小, 修改时间), 编码)
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),  # 需要先于 UTF-16 判断
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def bom_encoding(head):
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+def _decodes(head, encoding):
+    """head 能否按 encoding 严格解码，末尾被截断的多字节字符不算错误"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def sniff_encoding(head):
+    """根据文件开头的字节判断编码：BOM -> UTF-8 有效性 -> GBK 启发式，都不符合时按 latin-1 处理"""
+    encoding = bom_encoding(head)
+    if encoding is not None:
+        return encoding
+    if _decodes(head, 'utf-8'):
+        return 'utf-8'
+    if _decodes(head, 'gb18030'):
+        # 按 GBK 能解码的西文文本解出来多是生僻字，要求非 ASCII 字符中至少一半是常见的中日韩文字
+        text = head.decode('gb18030', errors='ignore')
+        non_ascii = sum(1 for ch in text if ord(ch) > 0x7f)
+        if len(_CJK_RE.findall(text)) * 2 >= non_ascii:
+            return 'gb18030'
+    return 'latin-1'
+
+
+def iter_text_file(file_path, chunk_size=TEXT_CHUNK_SIZE):
+    """按检测出的编码逐块解码文本文件，文件只读取一遍；编码按 (路径, 大小, 修改时间) 缓存
+
+    file_path 也可以是二进制流（如压缩包成员），此时不缓存编码。
+    """
+    if hasattr(file_path, 'read'):
+        data = file_path.read(max(chunk_size, ENCODING_SNIFF_SIZE))
+        yield from _decode_chunks(file_path, data, sniff_encoding(data), chunk_size)
+        return
+    with open(file_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        key = (st.st_size, st.st_mtime)
+        path = str(file_path)
+        cached = _ENCODING_CACHE.get(path)
+        if cached is not None and cached[0] == key:
+            _ENCODING_CACHE.move_to_end(path)
+            encoding = cached[1]
+            data = f.read(chunk_size)
+        else:
+            data = f.read(max(chunk_size, ENCODING_SNIFF_SIZE))
+            encoding = sniff_encoding(data)
+            _ENCODING_CACHE[path] = (key, encoding)
+            if len(_ENCODING_CACHE) > ENCODING_CACHE_SIZE:
+                _ENCODING_CACHE.popitem(last=False)
+        yield from _decode_chunks(f, data, encoding, chunk_size)
+
+
+def _decode_chunks(f, data, encoding, chunk_size):
+    """从已读出的 data 开始逐块解码 f 的剩余内容"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+    while data:
+        text = decoder.decode(data)
+        if text:
+            yield text
+        data = f.read(chunk_size)
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def read_text_prefix(file_path, limit):
+    """按检测出的编码读取文件开头最多 limit 个字符，用于预览"""
+    text = ""
+    chunks = iter_text_file(file_path, limit)
+    try:
+        for chunk in chunks:
+            text += chunk
+            if len(text) >= limit:
+                break
+    finally:
+        chunks.close()
+    return text[:limit]
+
+
+# 内容提取器注册表
+EXTRACTORS = {}  # 扩展名 -> 提取器实例
+
+
+def register_extractor(cls):
+    """类装饰器：按 extensions 把提取器注册到 EXTRACTORS"""
+    extractor = cls()
+    for ext in cls.extensions:
+        EXTRACTORS[ext] = extractor
+    return cls
+
+
+def get_extractor(file_path):
+    return EXTRACTORS.get(os.path.splitext(str(file_path))[1].lower())
+
+
+class Extractor:
+    """内容提取器基类，子类实现 read() 逐段产出文本；read() 的 source 为文件路径字符串或
+    可随机访问的二进制流（压缩包成员）
+
+    cost 为解析代价等级，搜索时先处理代价低的文件；timeout 为单个文件的解析时间上限（秒）。
+    backend_modules 中的模块在第一次使用时依次尝试导入，每个进程只解析一次；
+    都无法导入且 text_fallback 为 True 时按文本文件读取。
+    """
+    CHEAP, MEDIUM, EXPENSIVE = 0, 1, 2
+
+    extensions = ()
+    cost = MEDIUM
+    timeout = 60
+    backend_modules = ()
+    text_fallback = False
+
+    _backend = None
+    _resolved = False
+
+    @classmethod
+    def backend(cls):
+        if not cls._resolved:
+            cls._resolved = True
+            for name in cls.backend_modules:
+                try:
+                    cls._backend = importlib.import_module(name)
+                    break
+                except ImportError:
+                    continue
+            else:
+                if cls.backend_modules:
+                    print(f"未安装 {' / '.join(cls.backend_modules)}，无法解析 {' '.join(cls.extensions)} 文件内容")
+        return cls._backend
+
+    def iter_text(self, file_path, chunk_size=TEXT_CHUNK_SIZE):
+        """逐段产出文件的文本，无法解析时返回 None；file_path 也可以是二进制流"""
+        source = file_path if hasattr(file_path, 'read') else str(file_path)
+        if self.backend_modules and self.backend() is None:
+            return iter_text_file(source, chunk_size) if self.text_fallback else None
+        return self.read(source, chunk_size)
+
+    def read(self, source, chunk_size):
+        raise NotImplementedError
+
+
+@register_extractor
+class TextExtractor(Extractor):
+    extensions = TEXT_EXTENSIONS
+    cost = Extractor.CHEAP
+    timeout = 30
+
+    def read(self, source, chunk_size):
+        return iter_text_file(source, chunk_size)
+
+
+@register_extractor
+class PdfExtractor(Extractor):
+    """PDF 按页提取；PyMuPDF 新版本的模块名为 pymupdf，旧版本为 fitz"""
+    extensions = ('.pdf',)
+    cost = Extractor.EXPENSIVE
+    timeout = 120
+    backend_modules = ('pymupdf', 'fitz')
+    text_fallback = True
+
+    def read(self, source, chunk_size):
+        if isinstance(source, str):
+            doc = self.backend().open(source)
+        else:
+            doc = self.backend().open(stream=source.read(), filetype='pdf')
+        try:
+            for page in doc:
+                yield page.get_text()
+        finally:
+            doc.close()
+
+
+@register_extractor
+class DocxExtractor(Extractor):
+    extensions = ('.docx',)
+    backend_modules = ('docx',)
+    text_fallback = True
+
+    def read(self, source, chunk_size):
+        doc = self.backend().Document(source)
+        for para in doc.paragraphs:
+            yield para.text + " "
+
+
+@register_extractor
+class ExcelExtractor(Extractor):
+    extensions = ('.xlsx',)
+    backend_modules = ('openpyxl',)
+    text_fallback = True
+
+    def read(self, source, chunk_size):
+        wb = self.backend().load_workbook(source, read_only=True)
+        try:
+            for sheet in wb:
+                for row in sheet.iter_rows(values_only=True):
+                    yield "".join(str(cell) + " " for cell in row if cell)
+        finally:
+            wb.close()
+
+
+class ZipXmlExtractor(Extractor):
+    """ZIP 包中的 XML 文档（PPTX、ODT 等），逐个段落元素流式解析，只需要标准库"""
+    paragraph_tags = ()
+
+    def members(self, zf):
+        raise NotImplementedError
+
+    def read(self, source, chunk_size):
+        with zipfile.ZipFile(source) as zf:
+            for name in self.members(zf):
+                with zf.open(name) as f:
+                    for _, elem in ElementTree.iterparse(f):
+                        if elem.tag in self.paragraph_tags:
+                            yield "".join(elem.itertext()) + " "
+                            elem.clear()
+
+
+@register_extractor
+class PptxExtractor(ZipXmlExtractor):
+    extensions = ('.pptx',)
+    paragraph_tags = ('{http://schemas.openxmlformats.org/drawingml/2006/main}p',)
+
+    def members(self, zf):
+        slides = []
+        for name in zf.namelist():
+            match = re.fullmatch(r'ppt/slides/slide(\d+)\.xml', name)
+            if match:
+                slides.append((int(match.group(1)), name))
+        return [name for _, name in sorted(slides)]
+
+
+@register_extractor
+class OdtExtractor(ZipXmlExtractor):
+    extensions = ('.odt', '.odp', '.ods')
+    paragraph_tags = ('{urn:oasis:names:tc:opendocument:xmlns:text:1.0}p',
+                      '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}h')
+
+    def members(self, zf):
+        return ['content.xml']
+
+
+@register_extractor
+class EmlExtractor(Extractor):
+    """邮件：主题、发件人、收件人以及正文中的文本部分，附件不解析"""
+    extensions = ('.eml',)
+    timeout = 30
+
+    def read(self, source, chunk_size):
+        import email
+        from email import policy
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                message = email.message_from_binary_file(f, policy=policy.default)
+        else:
+            message = email.message_from_binary_file(source, policy=policy.default)
+        for header in ('subject', 'from', 'to', 'cc'):
+            if message[header]:
+                yield str(message[header]) + " "
+        for part in message.walk():
+            if part.is_multipart() or part.is_attachment():
+                continue
+            content_type = part.get_content_type()
+            if content_type not in ('text/plain', 'text/html'):
+                continue
+            try:
+                text = part.get_content()
+            except (LookupError, UnicodeDecodeError):
+                text = (part.get_payload(decode=True) or b"").decode('utf-8', errors='ignore')
+            if content_type == 'text/html':
+                text = html.unescape(re.sub(r'<[^>]+>', ' ', text))
+            yield text + " "
+
+
+CONTENT_EXTENSIONS = frozenset(EXTRACTORS)
+
+
+# 压缩包成员搜索
+ARCHIVE_SEPARATOR = "!/"                     # 成员路径写作 "archive.zip!/dir/file.docx"
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.7z')
+ARCHIVE_SUFFIXES = frozenset(os.path.splitext("x" + ext)[1] for ext in ARCHIVE_EXTENSIONS)
+ARCHIVE_MEMBER_LIMIT = 64 * 1024 * 1024      # 解析内容时读入内存的成员大小上限
+NESTED_ARCHIVE_LIMIT = 32 * 1024 * 1024      # 展开嵌套压缩包的大小上限
+ARCHIVE_MAX_DEPTH = 3                        # 最多展开的压缩包层数
+ARCHIVE_READER_CACHE_SIZE = 4                # 每个线程保持打开的压缩包数
+_archive_local = threading.local()
+
+
+def is_archive(name):
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_archive_member(path):
+    return ARCHIVE_SEPARATOR in path and is_archive(path.split(ARCHIVE_SEPARATOR, 1)[0])
+
+
+def archive_outer_path(path):
+    """压缩包成员所在的最外层压缩包路径，普通文件原样返回"""
+    return path.split(ARCHIVE_SEPARATOR, 1)[0] if is_archive_member(path) else path
+
+
+class ArchiveEntry(IndexedEntry):
+    """压缩包中的一个成员，path 为 "压缩包路径!/成员名" 形式"""
+    __slots__ = ()
+
+
+class ArchiveReader:
+    """压缩包读取的统一接口：members() 逐个产出普通文件成员的 (名称, 大小, 修改时间)，
+    open() 返回成员内容的二进制流。source 为文件路径或可随机访问的二进制流。"""
+
+    def close(self):
+        self.archive.close()
+
+    def read_member(self, name, limit):
+        """读出成员的全部内容，超过 limit 字节时抛出 ValueError"""
+        with self.open(name) as f:
+            data = f.read(limit + 1)
+        if len(data) > limit:
+            raise ValueError(f"压缩包成员超过 {limit // (1024 * 1024)} MB，已跳过")
+        return data
+
+
+class ZipArchiveReader(ArchiveReader):
+    def __init__(self, source):
+        self.archive = zipfile.ZipFile(source)
+
+    def members(self):
+        for info in self.archive.infolist():
+            if info.is_dir():
+                continue
+            try:
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+            except (OverflowError, ValueError):
+                mtime = 0
+            yield info.filename, info.file_size, mtime
+
+    def open(self, name):
+        return self.archive.open(name)
+
+
+class TarArchiveReader(ArchiveReader):
+    # 压缩的 tar 包只能顺序解压，回头读取前面的成员时要从头重新解压，不太大时先整体解压到内存
+    DECOMPRESSORS = {'.gz': gzip.open, '.tgz': gzip.open, '.bz2': bz2.open, '.tbz2': bz2.open,
+                     '.xz': lzma.open, '.txz': lzma.open}
+
+    def __init__(self, source, name):
+        opener = self.DECOMPRESSORS.get(os.path.splitext(name.lower())[1])
+        if opener is not None:
+            with opener(source) as f:
+                data = f.read(NESTED_ARCHIVE_LIMIT + 1)
+            if len(data) <= NESTED_ARCHIVE_LIMIT:
+                source = io.BytesIO(data)
+            elif not isinstance(source, str):
+                source.seek(0)
+        if isinstance(source, str):
+            self.archive = tarfile.open(source, 'r:*')
+        else:
+            self.archive = tarfile.open(fileobj=source, mode='r:*')
+
+    def members(self):
+        # 逐个读取成员头，压缩的 tar 包不需要先完整解压一遍
+        for info in self.archive:
+            if info.isfile():
+                yield info.name, info.size, info.mtime
+
+    def open(self, name):
+        return self.archive.extractfile(name)
+
+
+class SevenZipArchiveReader(ArchiveReader):
+    """7z 压缩包，需要安装 py7zr"""
+
+    def __init__(self, source):
+        import py7zr
+        import py7zr.io
+        self._io = py7zr.io
+        self.archive = py7zr.SevenZipFile(source, 'r')
+
+    def members(self):
+        for info in self.archive.list():
+            if not info.is_directory:
+                mtime = info.creationtime.timestamp() if info.creationtime else 0
+                yield info.filename, info.uncompressed, mtime
+
+    def open(self, name):
+        factory = self._io.BytesIOFactory(ARCHIVE_MEMBER_LIMIT)
+        try:
+            self.archive.extract(targets=[name], factory=factory)
+        finally:
+            self.archive.reset()
+        product = factory.get(name)
+        product.seek(0)
+        return io.BytesIO(product.read())
+
+
+def open_archive(source, name):
+    lower = name.lower()
+    if lower.endswith('.zip'):
+        return ZipArchiveReader(source)
+    if lower.endswith('.7z'):
+        return SevenZipArchiveReader(source)
+    return TarArchiveReader(source, name)
+
+
+def get_archive_reader(path):
+    """返回压缩包（可以是 "a.zip!/b.zip" 形式的嵌套压缩包）的读取器
+
+    每个线程缓存最近使用的几个读取器，按最外层文件的大小和修改时间校验；
+    同一压缩包的成员依次读取时不必每次重新打开和解压。
+    """
+    readers = getattr(_archive_local, "readers", None)
+    if readers is None:
+        readers = _archive_local.readers = OrderedDict()
+    st = os.stat(path.split(ARCHIVE_SEPARATOR, 1)[0])
+    key = (st.st_size, st.st_mtime)
+    cached = readers.get(path)
+    if cached is not None and cached[0] == key:
+        readers.move_to_end(path)
+        return cached[1]
+
+    if ARCHIVE_SEPARATOR in path:
+        parent_path, name = path.rsplit(ARCHIVE_SEPARATOR, 1)
+        data = get_archive_reader(parent_path).read_member(name, NESTED_ARCHIVE_LIMIT)
+        reader = open_archive(io.BytesIO(data), name)
+    else:
+        reader = open_archive(path, path)
+    if cached is not None:
+        readers.pop(path)[1].close()
+    readers[path] = (key, reader)
+    while len(readers) > ARCHIVE_READER_CACHE_SIZE:
+        readers.popitem(last=False)[1][1].close()
+    return reader
+
+
+def close_archive_readers():
+    """关闭当前线程缓存的压缩包，避免文件一直被占用"""
+    readers = getattr(_archive_local, "readers", None)
+    while readers:
+        readers.popitem()[1][1].close()
+
+
+def list_archive(path):
+    """逐个产出压缩包中普通文件成员的 ArchiveEntry"""
+    reader = get_archive_reader(path)
+    for name, size, mtime in reader.members():
+        yield ArchiveEntry(path + ARCHIVE_SEPARATOR + name, name.rsplit('/', 1)[-1], size, mtime)
+
+
+def archive_member_entry(path):
+    """按成员路径查找压缩包成员，返回 ArchiveEntry"""
+    archive_path, name = path.rsplit(ARCHIVE_SEPARATOR, 1)
+    for member, size, mtime in get_archive_reader(archive_path).members():
+        if member == name:
+            return ArchiveEntry(path, name.rsplit('/', 1)[-1], size, mtime)
+    raise FileNotFoundError(f"压缩包中没有该文件: {path}")
+
+
+@contextlib.contextmanager
+def open_archive_member(path, seekable=True):
+    """打开压缩包成员，不写临时文件
+
+    seekable 为 True 时把成员读入内存（不超过 ARCHIVE_MEMBER_LIMIT），供需要随机访问的
+    解析库使用；否则直接返回解压流。
+    """
+    archive_path, name = path.rsplit(ARCHIVE_SEPARATOR, 1)
+    reader = get_archive_reader(archive_path)
+    if seekable:
+        yield io.BytesIO(reader.read_member(name, ARCHIVE_MEMBER_LIMIT))
+    else:
+        with reader.open(name) as stream:
+            yield stream
+
+
+class ContentSearchPool:
+    """在进程池中并行处理文件内容，task(path, *task_args) 为在子进程中执行的模块级函数
+
+    同时在途的任务数受 max_in_flight 限制，结果按完成顺序返回。工作进程崩溃时无法确定是
+    哪个文件导致的，在途文件会被逐个单独重新执行，再次崩溃的那个文件记为失败；某个文件的
+    解析超过时间上限（提交时指定，默认为 timeout 秒）时终止进程池，该文件记为失败，
+    其余在途文件重新提交。
+    """
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, task, task_args, workers, timeout=60, max_in_flight=None):
+        self.task = task
+        self.task_args = tuple(task_args)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.failed = 0
+        self._executor = None
+        self._pending = {}  # future -> [文件路径, 附带数据, 是否单独执行, 开始运行时间, 时间上限]
+        self._suspects = deque()  # 进程崩溃时在途、等待单独执行的文件
+
+    def __len__(self):
+        return len(self._pending) + len(self._suspects)
+
+    def submit(self, path, payload, timeout=None):
+        """提交一个文件；在途任务已满时先等待，返回等待期间完成的结果"""
+        results = []
+        while len(self._pending) >= self.max_in_flight or self._suspects:
+            results.extend(self.collect(self.POLL_INTERVAL))
+        self._submit(path, payload, False, timeout or self.timeout)
+        return results
+
+    def _submit(self, path, payload, isolated, timeout):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        future = self._executor.submit(self.task, path, *self.task_args)
+        self._pending[future] = [path, payload, isolated, None, timeout]
+
+    def collect(self, timeout=0):
+        """收集已完成的任务，返回 [(附带数据, task 的返回值)]，失败的文件返回值为 None"""
+        results = []
+        if self._pending:
+            done, _ = wait(list(self._pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                info = self._pending.pop(future)
+                path, payload = info[:2]
+                try:
+                    results.append((payload, future.result()))
+                except BrokenProcessPool:
+                    broken = True
+                    self._pending[future] = info
+                except Exception as e:
+                    print(f"内容搜索失败: {path} - {str(e)}")
+                    self.failed += 1
+                    results.append((payload, None))
+
+            if broken:
+                results.extend(self._restart(crashed=True))
+            else:
+                now = time.monotonic()
+                hung = set()
+                for future, info in self._pending.items():
+                    if info[3] is None:
+                        if future.running():
+                            info[3] = now
+                    elif now - info[3] > info[4]:
+                        hung.add(future)
+                if hung:
+                    results.extend(self._restart(hung=hung))
+
+        if self._suspects and not self._pending:
+            path, payload, timeout = self._suspects.popleft()
+            self._submit(path, payload, True, timeout)
+        return results
+
+    def _restart(self, crashed=False, hung=()):
+        """终止当前进程池，记录失败的文件，其余在途文件重新执行"""
+        results = []
+        pending, self._pending = self._pending, {}
+        self._terminate()
+        for future, (path, payload, isolated, _, timeout) in pending.items():
+            if future in hung:
+                print(f"内容搜索超时，已跳过: {path}")
+            elif crashed and isolated:
+                print(f"内容搜索导致工作进程退出，已跳过: {path}")
+            elif crashed:
+                self._suspects.append((path, payload, timeout))
+                continue
+            else:
+                self._submit(path, payload, isolated, timeout)
+                continue
+            self.failed += 1
+            results.append((payload, None))
+        return results
+
+    def drain(self):
+        """等待全部在途任务完成，逐批产出结果"""
+        while self._pending or self._suspects:
+            results = self.collect(self.POLL_INTERVAL)
+            if results:
+                yield results
+
+    def _terminate(self):
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def shutdown(self):
+        """放弃所有在途任务并结束工作进程"""
+        self._pending = {}
+        self._suspects.clear()
+        self._terminate()
+
+
+# 全文索引
+_WORD_RUN_RE = re.compile(r'\w+')
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+
+def tokenize_text(text):
+    """全文索引分词：按连续的文字字符切分后取相邻两字（bigram），中日韩文字另外保留单字
+
+    文本中包含某个关键词时，关键词分出的所有词元必然也出现在文本的词元中，
+    因此可以用倒排表求交集得到候选文档，再用 KeywordMatcher 精确验证。
+    """
+    tokens = set()
+    for run in _WORD_RUN_RE.findall(text.lower()):
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        tokens.update(_CJK_RE.findall(run))
+    return tokens
+
+
+class FullTextIndex:
+    """可选的全文索引：保存每个文档提取出的文本（zlib 压缩）以及词元到文档的倒排表
+
+    文档按 (路径, 大小, 修改时间) 判断是否需要重新提取，complete 标记保存的是否为全文。
+    每个线程应使用自己的实例。
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS docs (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            complete INTEGER NOT NULL,
+            text BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            token TEXT NOT NULL,
+            doc_id INTEGER NOT NULL,
+            PRIMARY KEY (token, doc_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_cache_dir(), "fulltext.sqlite3")
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != EXTRACT_VERSION:
+            self.conn.execute("DELETE FROM postings")
+            self.conn.execute("DELETE FROM docs")
+            self.conn.execute(f"PRAGMA user_version = {EXTRACT_VERSION}")
+            self.conn.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def document(self, path):
+        """返回 (大小, 修改时间, 是否全文)，用于判断文档是否需要重新提取；不在索引中时返回 None"""
+        row = self.conn.execute("SELECT size, mtime, complete FROM docs WHERE path = ?", (path,)).fetchone()
+        return None if row is None else (row[0], row[1], bool(row[2]))
+
+    def purge_missing(self, folder, index_db):
+        """删除 folder 下已不在文件元数据索引中的文件的文档，返回删除的文档数
+
+        压缩包成员的文档在压缩包本身仍在索引中时保留。文件元数据索引在刷新时已经按目录
+        增删文件，这里直接与其 files 表比较，文件被删除或移走后全文索引不会一直增长。
+        """
+        self.commit()  # ATTACH 不能在事务中执行
+        low, high = MetadataIndex._path_range(MetadataIndex.normalize(folder))
+        conn = self.conn
+        conn.execute("ATTACH DATABASE ? AS meta", (index_db,))
+        try:
+            ids = [(row[0],) for row in conn.execute(
+                """SELECT id FROM docs WHERE path >= ? AND path < ?
+                   AND path NOT IN (SELECT path FROM meta.files WHERE path >= ? AND path < ?)
+                   AND (instr(path, ?) = 0
+                        OR substr(path, 1, instr(path, ?) - 1) NOT IN (SELECT path FROM meta.files))""",
+                (low, high, low, high, ARCHIVE_SEPARATOR, ARCHIVE_SEPARATOR))]
+            if ids:
+                conn.executemany("DELETE FROM postings WHERE doc_id = ?", ids)
+                conn.executemany("DELETE FROM docs WHERE id = ?", ids)
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE meta")
+        return len(ids)
+
+    def add_document(self, path, size, mtime, text, complete=True):
+        conn = self.conn
+        row = conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+        data = zlib.compress(text.encode('utf-8'))
+        if row is None:
+            doc_id = conn.execute("INSERT INTO docs (path, size, mtime, complete, text) VALUES (?, ?, ?, ?, ?)",
+                                  (path, size, mtime, int(complete), data)).lastrowid
+        else:
+            doc_id = row[0]
+            conn.execute("UPDATE docs SET size = ?, mtime = ?, complete = ?, text = ? WHERE id = ?",
+                         (size, mtime, int(complete), data, doc_id))
+            conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        conn.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)",
+                         [(token, doc_id) for token in tokenize_text(text)])
+        self._uncommitted += 1
+        if self._uncommitted >= 200:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def _docs_with_all(self, tokens):
+        """包含全部词元的文档 id 集合；tokens 为空时返回 None 表示无法缩小范围"""
+        result = None
+        # 双字词元通常比单字少见，先查询以便交集尽早变小
+        for token in sorted(tokens, key=len, reverse=True):
+            ids = {row[0] for row in self.conn.execute("SELECT doc_id FROM postings WHERE token = ?", (token,))}
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    def search(self, matcher, folders, limit=None):
+        """返回索引中 folders 下内容与 matcher 匹配的文档路径集合，limit 为每个文档最多检查的字符数
+
+        关键词无法通过倒排表缩小范围时（只有排除词、单个英文字母等），只按路径区间读取
+        folders 下的文档，不会解压整个索引。
+        """
+        ranges = [MetadataIndex._path_range(MetadataIndex.normalize(folder)) for folder in folders]
+        candidates = None
+        for term in matcher.exact + matcher.must_include:
+            ids = self._docs_with_all(tokenize_text(term))
+            if ids is not None:
+                candidates = ids if candidates is None else candidates & ids
+
+        if matcher.any_include:
+            union = set()
+            for term in matcher.any_include:
+                ids = self._docs_with_all(tokenize_text(term))
+                if ids is None:
+                    union = None
+                    break
+                union |= ids
+            if union is not None:
+                candidates = union if candidates is None else candidates & union
+
+        if candidates is None:
+            rows = itertools.chain.from_iterable(
+                self.conn.execute("SELECT path, text FROM docs WHERE path >= ? AND path < ?", path_range)
+                for path_range in ranges)
+        else:
+            rows = (self.conn.execute("SELECT path, text FROM docs WHERE id = ?", (doc_id,)).fetchone()
+                    for doc_id in candidates)
+            rows = (row for row in rows if any(low <= row[0] < high for low, high in ranges))
+        return {path for path, data in rows
+                if matcher.matches(zlib.decompress(data).decode('utf-8')[:limit])}
+
+
+# 内容提取缓存
+class ExtractionCache:
+    """提取出的文本的两级缓存：内存中的 LRU，加上可选的 zlib 压缩磁盘缓存
+
+    条目按路径保存，并用 (大小, 修改时间) 校验，文件变化后旧条目作废；complete 标记文本是否为
+    全文，快速模式只提取了开头部分的条目不能用于全文搜索。内存部分在多次搜索之间保留；
+    磁盘部分由搜索线程在 open() 和 close() 之间使用。
+    """
+    MEMORY_LIMIT = 32 * 1024 * 1024    # 内存中缓存的字符总数上限
+    DISK_LIMIT = 256 * 1024 * 1024     # 磁盘缓存压缩后的字节数上限
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS extracts (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            complete INTEGER NOT NULL,
+            used REAL NOT NULL,
+            text BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS extracts_used ON extracts (used);
+    """
+
+    def __init__(self, use_disk=True, db_path=None, memory_limit=None, disk_limit=None):
+        self.use_disk = use_disk
+        self.db_path = db_path
+        self.memory_limit = memory_limit or self.MEMORY_LIMIT
+        self.disk_limit = disk_limit or self.DISK_LIMIT
+        self._memory = OrderedDict()  # 路径 -> (大小, 修改时间, 是否全文, 文本)
+        self._memory_chars = 0
+        self._conn = None
+        self._disk_bytes = 0
+        self._uncommitted = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def open(self):
+        """打开磁盘缓存；打开失败时只使用内存缓存"""
+        if not self.use_disk or self._conn is not None:
+            return
+        try:
+            db_path = self.db_path or os.path.join(get_cache_dir(), "extract_cache.sqlite3")
+            self._conn = sqlite3.connect(db_path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != EXTRACT_VERSION:
+                self._conn.execute("DELETE FROM extracts")
+                self._conn.execute(f"PRAGMA user_version = {EXTRACT_VERSION}")
+                self._conn.commit()
+            self._disk_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(length(text)), 0) FROM extracts").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"打开提取缓存失败，只使用内存缓存: {str(e)}")
+            self._conn = None
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            self._trim_disk()
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"写入提取缓存失败: {str(e)}")
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, path, size, mtime, complete=False):
+        """返回缓存的文本，未命中、文件已变化或要求全文而缓存的只是开头部分时返回 None"""
+        cached = self._memory.get(path)
+        if cached is not None:
+            if cached[:2] == (size, mtime):
+                if cached[2] or not complete:
+                    self._memory.move_to_end(path)
+                    self.hits += 1
+                    return cached[3]
+            else:
+                self._forget(path)
+
+        if self._conn is not None:
+            try:
+                row = self._conn.execute("SELECT size, mtime, complete, text FROM extracts WHERE path = ?",
+                                         (path,)).fetchone()
+                if row is not None and row[:2] == (size, mtime) and (row[2] or not complete):
+                    text = zlib.decompress(row[3]).decode('utf-8')
+                    self._conn.execute("UPDATE extracts SET used = ? WHERE path = ?", (time.time(), path))
+                    self._remember(path, size, mtime, bool(row[2]), text)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return text
+            except (sqlite3.Error, zlib.error, UnicodeDecodeError) as e:
+                print(f"读取提取缓存失败: {path} - {str(e)}")
+
+        self.misses += 1
+        return None
+
+    def put(self, path, size, mtime, text, complete=True):
+        self._remember(path, size, mtime, complete, text)
+        if self._conn is None:
+            return
+        data = zlib.compress(text.encode('utf-8'))
+        try:
+            self._conn.execute("INSERT OR REPLACE INTO extracts VALUES (?, ?, ?, ?, ?, ?)",
+                               (path, size, mtime, int(complete), time.time(), data))
+        except sqlite3.Error as e:
+            print(f"写入提取缓存失败: {path} - {str(e)}")
+            return
+        self._disk_bytes += len(data)  # 覆盖旧条目时会多算，_trim_disk 会重新统计
+        self._uncommitted += 1
+        if self._uncommitted >= 200:
+            self._trim_disk()
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def _remember(self, path, size, mtime, complete, text):
+        # 单个文本超过上限的 1/8 时不放入内存，避免把其余条目全部挤出
+        if len(text) * 8 > self.memory_limit:
+            return
+        self._forget(path)
+        self._memory[path] = (size, mtime, complete, text)
+        self._memory_chars += len(text)
+        while self._memory_chars > self.memory_limit:
+            _, (_, _, _, old_text) = self._memory.popitem(last=False)
+            self._memory_chars -= len(old_text)
+            self.evictions += 1
+
+    def _forget(self, path):
+        cached = self._memory.pop(path, None)
+        if cached is not None:
+            self._memory_chars -= len(cached[3])
+
+    def _trim_disk(self):
+        """磁盘缓存超过上限时删除最久未使用的条目，直到降到上限的 90%"""
+        if self._disk_bytes <= self.disk_limit:
+            return
+        conn = self._conn
+        self._disk_bytes = conn.execute("SELECT COALESCE(SUM(length(text)), 0) FROM extracts").fetchone()[0]
+        if self._disk_bytes <= self.disk_limit:
+            return
+        excess = self._disk_bytes - self.disk_limit * 0.9
+        removed = []
+        for path, length in conn.execute("SELECT path, length(text) FROM extracts ORDER BY used"):
+            removed.append((path,))
+            excess -= length
+            self._disk_bytes -= length
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM extracts WHERE path = ?", removed)
+        self.evictions += len(removed)
+
+    def summary(self):
+        """本次搜索的缓存统计，没有访问时返回空字符串"""
+        if not self.hits and not self.misses:
+            return ""
+        return (f"提取缓存: 命中 {self.hits}（磁盘 {self.disk_hits}），"
+                f"未命中 {self.misses}，淘汰 {self.evictions}")
+
+
+class SearchFilter:
+    """按代价从低到高依次执行的过滤流水线：扩展名 -> 文件名 -> 大小/日期 -> 内容
+
+    扩展名和文件名只需要目录项本身，不会触发 stat；大小和日期在需要时才 stat 一次；
+    内容匹配最昂贵，放在最后。每一级排除的文件数记录在 rejected 中。
+    """
+    STAGE_EXTENSION = "扩展名"
+    STAGE_FILENAME = "文件名"
+    STAGE_STAT = "大小/日期"
+    STAGE_CONTENT = "内容"
+    STAGES = (STAGE_EXTENSION, STAGE_FILENAME, STAGE_STAT, STAGE_CONTENT)
+
+    def __init__(self, keyword, file_types, search_mode, size_range, mod_date_range):
+        self.keyword = keyword
+        self.matcher = compile_keyword(keyword)
+        self.search_mode = search_mode
+        self.extensions = frozenset(file_types) if file_types else None
+        self.min_size, self.max_size = size_range
+
+        # 把日期范围预先换算成时间戳区间，逐个文件比较时不再构造 date 对象
+        self.min_mtime = None
+        self.max_mtime = None
+        if mod_date_range != (None, None) and mod_date_range != "custom":
+            start_date, end_date = mod_date_range
+            self.min_mtime = datetime.datetime.combine(start_date, datetime.time.min).timestamp()
+            self.max_mtime = datetime.datetime.combine(
+                end_date + datetime.timedelta(days=1), datetime.time.min).timestamp()
+
+        self.check_filename = bool(keyword) and search_mode in ("filename", "both")
+        self.check_content = bool(keyword) and search_mode in ("content", "both")
+        self.rejected = dict.fromkeys(self.STAGES, 0)
+
+    def check(self, entry):
+        """执行内容之前的各级过滤，返回 (stat 结果, 是否还需匹配内容)，被排除时 stat 结果为 None"""
+        name = entry.name
+
+        ext = os.path.splitext(name)[1].lower()
+        if self.extensions is not None and ext not in self.extensions:
+            self.rejected[self.STAGE_EXTENSION] += 1
+            return None, False
+
+        filename_match = False
+        if self.check_filename:
+            filename_match = self.matcher.matches(name)
+            if not filename_match and self.search_mode == "filename":
+                self.rejected[self.STAGE_FILENAME] += 1
+                return None, False
+
+        # 不支持内容搜索的格式不可能通过内容匹配，无需 stat
+        needs_content = self.check_content and not filename_match
+        if needs_content and ext not in CONTENT_EXTENSIONS:
+            self.rejected[self.STAGE_CONTENT] += 1
+            return None, False
+
+        file_stat = entry.stat()
+        if not (self.min_size <= file_stat.st_size <= self.max_size):
+            self.rejected[self.STAGE_STAT] += 1
+            return None, False
+        if self.min_mtime is not None and not (self.min_mtime <= file_stat.st_mtime < self.max_mtime):
+            self.rejected[self.STAGE_STAT] += 1
+            return None, False
+
+        # "两者同时" 模式下文件名已匹配时无需再检查内容
+        return file_stat, needs_content
+
+    def reject_content(self):
+        self.rejected[self.STAGE_CONTENT] += 1
+
+    def summary(self):
+        return "，".join(f"{stage}排除 {count}" for stage, count in self.rejected.items() if count)
+
+class SearchEngine(QThread):
+    """后台搜索引擎：在工作线程中遍历文件夹，分批把结果发送给界面
+
+    content_workers 大于 1 时，内容匹配交给 ContentSearchPool 在多个进程中并行执行，
+    匹配结果按完成顺序返回。use_index 为 True 时，已建立索引的文件夹先增量刷新
+    再查询 MetadataIndex，其余文件夹在遍历的同时建立索引。use_fulltext 为 True 时，内容匹配
+    优先使用 FullTextIndex 中的文本，只有新文件或大小/修改时间变化的文件才重新提取。
+    提供 extraction_cache 时，提取出的文本先在 ExtractionCache 中查找，未命中才交给提取函数。
+    content_limit 为快速模式下每个文件最多检查的字符数，None 表示流式检查全文。
+    需要解析的 Word/Excel/PDF 等文件先记录下来，遍历结束后按提取器的代价从低到高处理，
+    文本文件的结果不会被个别大文件拖慢。search_archives 为 True 时展开 ZIP/tar/7z 压缩包，
+    其中的成员以 "压缩包路径!/成员名" 的形式与普通文件一样过滤和匹配。
+    """
+    results_ready = pyqtSignal(list)       # 一批搜索结果，每项为 (路径, 文件名, 大小, 修改时间)
+    directory_changed = pyqtSignal(str)    # 当前搜索路径
+    search_finished = pyqtSignal(bool, int)  # (是否被取消, 找到的文件数)
+
+    BATCH_SIZE = 200        # 每批最多结果数
+    BATCH_INTERVAL = 0.2    # 两批之间的最长间隔（秒）
+    DIRECTORY_INTERVAL = 0.1  # 两次发送当前搜索路径的最短间隔（秒）
+    SQL_TERM_LIMIT = 50     # 交给 SQLite 判断的关键词数上限
+
+    def __init__(self, folders, keyword, file_types, include_subfolders, search_mode,
+                 size_range, mod_date_range, content_workers=1, use_index=False, use_fulltext=False,
+                 extraction_cache=None, content_limit=None, search_archives=False, parent=None):
+        super().__init__(parent)
+        self.folders = list(folders)
+        self.include_subfolders = include_subfolders
+        self.search_archives = search_archives
+        self.use_index = use_index
+        self.index = None
+        self.filter = SearchFilter(keyword, file_types, search_mode, size_range, mod_date_range)
+        self.use_fulltext = use_fulltext and self.filter.check_content
+        self.fulltext = None
+        self.fulltext_matches = set()
+        self.cache = extraction_cache if self.filter.check_content else None
+        self.content_limit = content_limit
+        # 需要缓存或索引文本时让 scan_content 同时返回读到的文本，写入缓存和全文索引在搜索线程中进行
+        keep_limit = KEEP_TEXT_LIMIT if self.use_fulltext or self.cache is not None else 0
+        # 使用全文索引时不做字节预过滤：不匹配的文本文件也要解码一次写入索引，之后换关键词搜索
+        # 直接查询索引；只用内容缓存时预过滤与缓存命中的代价相当，被预过滤排除的文件不写入缓存
+        self.scan_args = (keyword, content_limit, keep_limit, not self.use_fulltext)
+        self.content_pool = None
+        if self.filter.check_content and content_workers > 1:
+            self.content_pool = ContentSearchPool(scan_content, self.scan_args, content_workers)
+        self.deferred = []  # (目录项, stat 结果, 提取器)，遍历结束后再解析
+        self.found_count = 0
+        self.processed = 0
+        self._cancel_event = threading.Event()
+        self._batch = []
+        self._last_flush = 0.0
+        self._last_directory = 0.0
+
+    def cancel(self):
+        """请求取消搜索，工作线程会在处理完当前文件后退出"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        self._last_flush = time.monotonic()
+        try:
+            if self.use_index:
+                try:
+                    self.index = MetadataIndex()
+                except sqlite3.Error as e:
+                    print(f"打开索引失败，改为直接遍历: {str(e)}")
+            if self.use_fulltext:
+                self.open_fulltext()
+            if self.cache is not None:
+                self.cache.reset_counters()
+                self.cache.open()
+            for folder in self.folders:
+                if self.is_cancelled():
+                    break
+                self.search_folder(folder)
+            if not self.is_cancelled():
+                self.process_deferred()
+            if self.content_pool is not None:
+                for results in self.content_pool.drain():
+                    self.add_content_results(results)
+                    if self.is_cancelled():
+                        break
+        except Exception:
+            print(traceback.format_exc())
+        finally:
+            if self.content_pool is not None:
+                self.content_pool.shutdown()
+            if self.index is not None:
+                self.index.close()
+            if self.fulltext is not None:
+                self.fulltext.close()
+            if self.cache is not None:
+                self.cache.close()
+            close_archive_readers()
+            self.flush_results()
+            self.search_finished.emit(self.is_cancelled(), self.found_count)
+
+    def flush_results(self):
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self.results_ready.emit(batch)
+        self._last_flush = time.monotonic()
+
+    def report_directory(self, root):
+        """发送当前搜索路径；界面只显示最新的路径，间隔太短的中间路径直接丢弃"""
+        now = time.monotonic()
+        if now - self._last_directory >= self.DIRECTORY_INTERVAL:
+            self._last_directory = now
+            self.directory_changed.emit(root)
+
+    def add_result(self, path, name, file_stat):
+        self._batch.append((path, name, file_stat.st_size, file_stat.st_mtime))
+        self.found_count += 1
+        if (len(self._batch) >= self.BATCH_SIZE
+                or time.monotonic() - self._last_flush >= self.BATCH_INTERVAL):
+            self.flush_results()
+
+    def add_content_results(self, results):
+        for (path, name, file_stat), value in results:
+            if self.accept_scan(path, file_stat, value):
+                self.add_result(path, name, file_stat)
+            else:
+                self.filter.reject_content()
+
+    def open_fulltext(self):
+        try:
+            self.fulltext = FullTextIndex()
+            self.fulltext_matches = self.fulltext.search(self.filter.matcher, self.folders, self.content_limit)
+        except sqlite3.Error as e:
+            print(f"打开全文索引失败，改为直接提取内容: {str(e)}")
+            self.fulltext = None
+
+    def accept_scan(self, path, file_stat, result):
+        """处理 scan_content 的结果：读到的文本写入缓存和全文索引，返回是否匹配"""
+        if result is None:
+            return False
+        matched, text, complete = result
+        if text is not None:
+            if self.cache is not None:
+                self.cache.put(path, file_stat.st_size, file_stat.st_mtime, text, complete)
+            self.index_text(path, file_stat, text, complete)
+        return matched
+
+    def index_text(self, path, file_stat, text, complete):
+        if self.fulltext is None:
+            return
+        try:
+            self.fulltext.add_document(path, file_stat.st_size, file_stat.st_mtime, text, complete)
+        except sqlite3.Error as e:
+            print(f"写入全文索引失败: {path} - {str(e)}")
+
+    def match_content(self, entry, file_stat):
+        """检查文件内容，返回是否匹配；推迟处理或交给进程池异步处理时返回 None"""
+        path = entry.path
+        # 检查全文时不能使用只保存了开头部分的索引和缓存
+        need_complete = self.content_limit is None
+        if self.fulltext is not None:
+            doc = self.fulltext.document(path)
+            if doc is not None and doc[:2] == (file_stat.st_size, file_stat.st_mtime) \
+                    and (doc[2] or not need_complete):
+                return path in self.fulltext_matches
+        if self.cache is not None:
+            text = self.cache.get(path, file_stat.st_size, file_stat.st_mtime, need_complete)
+            if text is not None:
+                self.index_text(path, file_stat, text, need_complete)
+                return self.filter.matcher.matches(text[:self.content_limit])
+        extractor = get_extractor(path)
+        if extractor.cost > Extractor.CHEAP:
+            self.deferred.append((entry, file_stat, extractor))
+            return None
+        return self.scan_file(entry, file_stat, extractor)
+
+    def scan_file(self, entry, file_stat, extractor):
+        path = entry.path
+        if self.content_pool is not None:
+            # 进程池已满时 submit 会等待，并返回等待期间完成的结果
+            self.add_content_results(
+                self.content_pool.submit(path, (path, entry.name, file_stat), extractor.timeout))
+            return None
+        return self.accept_scan(path, file_stat, scan_content(path, *self.scan_args))
+
+    def process_deferred(self):
+        """按提取器代价从低到高解析遍历时推迟的文件"""
+        deferred, self.deferred = self.deferred, []
+        deferred.sort(key=lambda item: item[2].cost)
+        for entry, file_stat, extractor in deferred:
+            if self.is_cancelled():
+                return
+            self.poll_content()
+            self.report_directory(os.path.dirname(entry.path))
+            try:
+                matched = self.scan_file(entry, file_stat, extractor)
+            except Exception as e:
+                print(f"跳过文件 {entry.path}，原因: {str(e)}")
+                continue
+            if matched:
+                self.add_result(entry.path, entry.name, file_stat)
+            elif matched is not None:
+                self.filter.reject_content()
+
+    def poll_content(self):
+        """收集进程池中已完成的结果，并按时间间隔发送结果"""
+        pool = self.content_pool
+        if pool is not None and len(pool):
+            self.add_content_results(pool.collect())
+        if self._batch and time.monotonic() - self._last_flush >= self.BATCH_INTERVAL:
+            self.flush_results()
+
+    def search_folder(self, folder):
+        if not os.path.isdir(folder):
+            return
+        folder = os.path.abspath(folder)
+
+        index = self.index
+        if index is not None and not index.needs_full_scan(folder):
+            try:
+                index.refresh(folder, self._cancel_event, self.report_directory,
+                              recursive=self.include_subfolders)
+            except (OSError, sqlite3.Error) as e:
+                print(f"刷新索引失败: {folder} - {str(e)}")
+            else:
+                if not self.is_cancelled():
+                    self.purge_fulltext(folder)
+            if not self.is_cancelled():
+                self.search_index(folder)
+            return
+
+        # 包含子文件夹时顺便重建该文件夹的索引
+        indexing = index is not None and self.include_subfolders
+        if indexing:
+            try:
+                index.begin_folder(folder)
+            except (OSError, sqlite3.Error) as e:
+                print(f"重建索引失败: {folder} - {str(e)}")
+                indexing = False
+
+        for root, entries, subdirs in scan_directory(folder, self.include_subfolders):
+            if self.is_cancelled():
+                break
+            self.report_directory(root)
+            if indexing:
+                index.add_directory(root, entries, subdirs)
+            if not self.process_entries(root, entries):
+                break
+
+        if indexing:
+            try:
+                if self.is_cancelled():
+                    index.abort()
+                else:
+                    index.finish_folder(folder)
+                    self.purge_fulltext(folder)
+            except sqlite3.Error as e:
+                print(f"更新索引失败: {folder} - {str(e)}")
+
+    def purge_fulltext(self, folder):
+        """文件夹的索引刷新完成后，从全文索引中删除已不存在的文件"""
+        if self.fulltext is None or not self.include_subfolders:
+            return
+        try:
+            self.fulltext.purge_missing(folder, self.index.db_path)
+        except sqlite3.Error as e:
+            print(f"清理全文索引失败: {folder} - {str(e)}")
+
+    def search_index(self, folder):
+        """从索引中查询文件夹，扩展名条件直接交给 SQLite
+
+        原地修改文件不会改变目录的修改时间，索引中的大小和修改时间可能已过期，因此大小和
+        日期条件不交给 SQLite，而是由 process_entries 按每个候选文件的实际状态判断。
+        """
+        self.directory_changed.emit(f"{folder}（使用索引）")
+        f = self.filter
+        # 仅文件名模式下关键词也交给 SQLite 判断；关键词过多时仍由 SearchFilter 逐个匹配
+        name_matcher = None
+        if f.check_filename and f.search_mode == "filename" and f.matcher.term_count() <= self.SQL_TERM_LIMIT:
+            name_matcher = f.matcher
+        entries = self.index.query(folder, self.include_subfolders, f.extensions, name_matcher=name_matcher)
+        while True:
+            chunk = list(itertools.islice(entries, 1000))
+            if not chunk:
+                break
+            if not self.process_entries(folder, chunk, expand_archives=False):
+                return
+        # 压缩包本身不一定满足上面的条件，另外查询后展开
+        if self.search_archives:
+            for entry in self.index.query(folder, self.include_subfolders, ARCHIVE_SUFFIXES):
+                if is_archive(entry.name) and not self.search_archive(entry):
+                    return
+
+    def search_archive(self, entry):
+        """展开压缩包，其中的成员与普通文件一样过滤和匹配，搜索被取消时返回 False"""
+        path = entry.path
+        depth = path.count(ARCHIVE_SEPARATOR)
+        if depth >= ARCHIVE_MAX_DEPTH:
+            return True
+        if depth and entry.stat().st_size > NESTED_ARCHIVE_LIMIT:
+            print(f"嵌套的压缩包过大，已跳过: {path}")
+            return True
+        self.report_directory(path)
+        try:
+            members = list_archive(path)
+            while True:
+                chunk = list(itertools.islice(members, 1000))
+                if not chunk:
+                    return True
+                if not self.process_entries(path, chunk):
+                    return False
+        except Exception as e:
+            print(f"读取压缩包失败: {path} - {str(e)}")
+            return True
+
+    def process_entries(self, root, entries, expand_archives=True):
+        """对一组文件执行过滤和匹配，搜索被取消时返回 False"""
+        check = self.filter.check
+        self.poll_content()
+
+        for entry in entries:
+            if self.is_cancelled():
+                return False
+
+            try:
+                if type(entry) is IndexedEntry:
+                    # 原地修改文件不会改变目录的修改时间，索引中的大小和修改时间可能已过期；
+                    # 大小、日期条件以及内容缓存和全文索引都必须按文件的实际状态判断
+                    try:
+                        entry.refresh()
+                    except FileNotFoundError:
+                        continue
+                file_stat, needs_content = check(entry)
+                if file_stat is not None and needs_content:
+                    matched = self.match_content(entry, file_stat)
+                    if not matched:
+                        if matched is not None:
+                            self.filter.reject_content()
+                        file_stat = None
+            except Exception as e:
+                print(f"跳过文件 {entry.path}，原因: {str(e)}")
+                continue
+
+            self.processed += 1
+            if self.processed % 10000 == 0:
+                print(f"已处理 {self.processed} 个文件，当前路径: {root}")  # 调试日志
+
+            if file_stat is not None:
+                self.add_result(entry.path, entry.name, file_stat)
+            if expand_archives and self.search_archives and is_archive(entry.name):
+                if not self.search_archive(entry):
+                    return False
+        return True
+
+class IndexRefresher(QThread):
+    """在后台依次刷新加入队列的文件夹的索引"""
+    progress = pyqtSignal(str)           # 当前检查的目录
+    refresh_finished = pyqtSignal(dict)  # 各项计数的汇总
+
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._accepting = True
+        self._cancel_event = threading.Event()
+        self._last_progress = 0.0
+
+    def add_folders(self, folders):
+        """加入待刷新的文件夹；线程已经结束时返回 False"""
+        with self._lock:
+            if not self._accepting:
+                return False
+            self._queue.extend(folders)
+            return True
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def report(self, path):
+        now = time.monotonic()
+        if now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress.emit(path)
+
+    def run(self):
+        totals = dict.fromkeys(("checked", "relisted", "added", "updated", "removed"), 0)
+        index = None
+        try:
+            index = MetadataIndex()
+            while not self._cancel_event.is_set():
+                with self._lock:
+                    if not self._queue:
+                        self._accepting = False
+                        break
+                    folder = self._queue.popleft()
+                if not os.path.isdir(folder):
+                    continue
+                stats = index.refresh(folder, self._cancel_event, self.report,
+                                      full=index.needs_full_scan(folder))
+                for key, value in stats.items():
+                    totals[key] += value
+        except (OSError, sqlite3.Error) as e:
+            print(f"更新索引失败: {str(e)}")
+        finally:
+            with self._lock:
+                self._accepting = False
+            if index is not None:
+                index.close()
+            self.refresh_finished.emit(totals)
+
+
+# 文件复制
+COPY_BUFFER_SIZE = 1024 * 1024   # 每次读写的字节数，也是进度汇报的粒度
+COPY_RETRIES = 2                 # 单个文件复制失败后的重试次数
+COPY_RETRY_DELAY = 0.5           # 第 n 次重试前等待 n * COPY_RETRY_DELAY 秒
+# 这些错误重试也不会成功
+PERMANENT_COPY_ERRORS = (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)
+COPY_KERNEL_CHUNK = 8 * 1024 * 1024  # copy_file_range/sendfile 每次调用复制的字节数
+FICLONE = 0x40049409                 # Linux ioctl：btrfs/XFS 等文件系统上共享数据块（reflink）
+# 出现这些错误说明该复制方式在这对文件系统之间不可用，换下一种方式
+_COPY_UNSUPPORTED_ERRNOS = frozenset(
+    getattr(errno, name) for name in ('EXDEV', 'ENOSYS', 'EOPNOTSUPP', 'ENOTSUP', 'ENOTTY', 'EINVAL', 'EBADF')
+    if hasattr(errno, name))
+_unsupported_copy = set()  # (复制方式, 源设备, 目标设备)，已确认不可用的组合不再尝试
+
+
+class CopyCancelled(Exception):
+    """复制过程中用户取消"""
+
+
+def copy_stream(fsrc, fdst, progress=None, cancel_event=None):
+    """分块复制，每块之后调用 progress(字节数) 并检查是否取消"""
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise CopyCancelled()
+        buf = fsrc.read(COPY_BUFFER_SIZE)
+        if not buf:
+            return
+        fdst.write(buf)
+        if progress is not None:
+            progress(len(buf))
+
+
+def _copy_reflink(fsrc, fdst, progress, cancel_event):
+    import fcntl
+    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    if progress is not None:
+        progress(os.fstat(fdst.fileno()).st_size)
+
+
+def _copy_kernel(call, fsrc, fdst, progress, cancel_event):
+    """由内核在两个文件描述符之间复制，数据不经过用户空间；两个文件的读写位置随之前移
+
+    procfs、部分 FUSE 和网络文件系统第一次调用就返回 0，这时无法区分空文件和不支持，
+    返回 False，由调用方换用下一种方式。
+    """
+    infd, outfd = fsrc.fileno(), fdst.fileno()
+    copied = False
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise CopyCancelled()
+        count = call(infd, outfd, COPY_KERNEL_CHUNK)
+        if count == 0:
+            return copied
+        copied = True
+        if progress is not None:
+            progress(count)
+
+
+def _copy_file_range(fsrc, fdst, progress, cancel_event):
+    return _copy_kernel(os.copy_file_range, fsrc, fdst, progress, cancel_event)
+
+
+def _copy_sendfile(fsrc, fdst, progress, cancel_event):
+    return _copy_kernel(lambda infd, outfd, count: os.sendfile(outfd, infd, None, count),
+                 fsrc, fdst, progress, cancel_event)
+
+
+COPY_METHOD_NAMES = {  # 写入操作日志的复制方式说明
+    'reflink': "reflink 共享数据块",
+    'copy_file_range': "copy_file_range 内核复制",
+    'sendfile': "sendfile 内核复制",
+    'buffered': "分块读写",
+    'archive': "从压缩包解压",
+}
+# 按代价从低到高依次尝试的复制方式；Windows 上都不可用，直接分块读写
+KERNEL_COPY_METHODS = []
+if sys.platform.startswith('linux'):
+    KERNEL_COPY_METHODS.append(('reflink', _copy_reflink))
+    if hasattr(os, 'copy_file_range'):
+        KERNEL_COPY_METHODS.append(('copy_file_range', _copy_file_range))
+    if hasattr(os, 'sendfile'):
+        KERNEL_COPY_METHODS.append(('sendfile', _copy_sendfile))
+
+
+def copy_file_data(fsrc, fdst, progress=None, cancel_event=None):
+    """复制两个已打开文件的内容，返回使用的复制方式
+
+    同一文件系统上先尝试 reflink，然后是 copy_file_range、sendfile，都不可用时分块读写。
+    某种方式在一对设备之间不可用时记录下来，之后的文件直接跳过。内核复制会同步推进两个
+    文件的读写位置，中途换用下一种方式时从已复制的位置继续；一个字节都没有复制时
+    （返回 False）同样换用下一种方式。
+    """
+    devices = (os.fstat(fsrc.fileno()).st_dev, os.fstat(fdst.fileno()).st_dev)
+    for method, func in KERNEL_COPY_METHODS:
+        if (method, devices) in _unsupported_copy:
+            continue
+        # reflink 只能克隆整个文件，断点续传时跳过
+        if method == 'reflink' and (devices[0] != devices[1] or fsrc.tell()):
+            continue
+        try:
+            if func(fsrc, fdst, progress, cancel_event) is not False:
+                return method
+        except OSError as e:
+            if e.errno not in _COPY_UNSUPPORTED_ERRNOS:
+                raise
+            _unsupported_copy.add((method, devices))
+    copy_stream(fsrc, fdst, progress, cancel_event)
+    return 'buffered'
+
+
+def _resume_position(fsrc, fdst):
+    """把两个文件定位到可以继续复制的位置并返回该位置
+
+    只保留目标文件中完整的块，并要求最后一块与源文件相同，否则从头复制。
+    """
+    fdst.seek(0, os.SEEK_END)
+    offset = min(fdst.tell(), os.fstat(fsrc.fileno()).st_size) // COPY_BUFFER_SIZE * COPY_BUFFER_SIZE
+    if offset:
+        fsrc.seek(offset - COPY_BUFFER_SIZE)
+        fdst.seek(offset - COPY_BUFFER_SIZE)
+        if fsrc.read(COPY_BUFFER_SIZE) != fdst.read(COPY_BUFFER_SIZE):
+            offset = 0
+    fsrc.seek(offset)
+    fdst.seek(offset)
+    fdst.truncate()
+    return offset
+
+
+@contextlib.contextmanager
+def _copy_target(dst, resume=False):
+    """打开复制的目标文件，之后出错或取消时删除写了一半的目标文件
+
+    只有成功打开（并截断）目标文件之后才会删除，源文件打不开时原有的目标文件不受影响。
+    续传时打开的是上次留下的副本，出错时保留，下次继续。
+    """
+    out = open(dst, 'r+b' if resume else 'wb')
+    try:
+        with out:
+            yield out
+    except BaseException:
+        if not resume:
+            with contextlib.suppress(OSError):
+                os.remove(dst)
+        raise
+
+
+def copy_result_file(src, dst, progress=None, cancel_event=None, resume=False):
+    """复制一个搜索结果，保留修改时间等属性，返回使用的复制方式；压缩包成员直接从压缩包解压
+
+    resume 为 True 时目标文件是上次中断时留下的不完整副本，从已复制的位置继续。
+    复制完成后目标文件的大小必须与源文件一致。复制失败或取消时删除本次写入的不完整
+    目标文件（续传的副本除外）。
+    """
+    if is_archive_member(src):
+        with open_archive_member(src, seekable=False) as f, _copy_target(dst) as out:
+            copy_stream(f, out, progress, cancel_event)
+        return 'archive'
+    resume = resume and os.path.exists(dst)
+    # 源文件不经缓冲，内核复制和分块读取共用同一个读取位置
+    with open(src, 'rb', buffering=0) as f, _copy_target(dst, resume) as out:
+        if resume:
+            offset = _resume_position(f, out)
+            if offset and progress is not None:
+                progress(offset)
+        method = copy_file_data(f, out, progress, cancel_event)
+        out.flush()
+        # 虚拟文件系统中的文件大小可能报告为 0，这时无法校验
+        size, copied = os.fstat(f.fileno()).st_size, os.fstat(out.fileno()).st_size
+        if size and copied != size:
+            raise OSError(errno.EIO, f"复制不完整：已复制 {copied} 字节，源文件 {size} 字节", src)
+        out.close()
+        shutil.copystat(src, dst)
+    return method
+
+
+def _stat_key(path):
+    """返回 (大小, 修改时间)，文件不存在或是压缩包成员时返回 (None, None)"""
+    if is_archive_member(path):
+        return None, None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    return st.st_size, st.st_mtime
+
+
+class CopyJournal:
+    """归集任务日志：在目标文件夹中逐行追加记录每个文件的计划、开始和完成状态
+
+    每行一个 JSON 对象：
+    - {"op": "plan", "src", "dst", "size"}：任务开始时写入全部文件
+    - {"op": "start", "dst", "size", "mtime"}：开始复制，记录源文件的大小和修改时间
+    - {"op": "done", "dst", "size", "mtime"}：复制完成，记录目标文件的大小和修改时间
+    程序中途关闭后，resume_jobs() 跳过目标文件仍与记录一致的已完成文件，源文件未变化的
+    不完整副本从中断处继续。任务全部成功后删除日志。开始和完成记录由复制线程写入。
+    """
+    FILE_NAME = ".filegather_copy_journal.jsonl"
+
+    def __init__(self, target_folder):
+        self.path = os.path.join(target_folder, self.FILE_NAME)
+        self.resumed = False
+        self._file = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def load(self):
+        """读取日志，返回 (计划 {目标: (源, 大小)}, 开始 {目标: (大小, 修改时间)}, 完成 {目标: (大小, 修改时间)})
+
+        程序崩溃时最后一行可能不完整，无法解析的行直接忽略。
+        """
+        planned, started, finished = {}, {}, {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        op, dst = record['op'], record['dst']
+                        if op == 'plan':
+                            planned[dst] = (record['src'], record['size'])
+                        elif op == 'start':
+                            started[dst] = (record['size'], record['mtime'])
+                        elif op == 'done':
+                            finished[dst] = (record['size'], record['mtime'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError as e:
+            print(f"读取归集任务日志失败: {self.path} - {str(e)}")
+        return planned, started, finished
+
+    def resume_jobs(self):
+        """返回 (未完成的 (源, 目标, 大小) 列表, 可以续传的目标路径集合, 已完成文件数)"""
+        planned, started, finished = self.load()
+        jobs, partial, done = [], set(), 0
+        for dst, (src, size) in planned.items():
+            if dst in finished and _stat_key(dst) == finished[dst]:
+                done += 1
+                continue
+            if dst in started and started[dst][1] is not None and _stat_key(src) == started[dst]:
+                partial.add(dst)
+            jobs.append((src, dst, size))
+        self.resumed = True
+        return jobs, partial, done
+
+    def open(self, jobs):
+        """新任务重写日志并记录全部计划，继续的任务在原日志后追加"""
+        try:
+            self._file = open(self.path, 'a' if self.resumed else 'w', encoding='utf-8')
+            if not self.resumed:
+                for src, dst, size in jobs:
+                    self._write({'op': 'plan', 'src': src, 'dst': dst, 'size': size})
+                self.flush()
+        except OSError as e:
+            print(f"写入归集任务日志失败，本次复制无法续传: {self.path} - {str(e)}")
+            self._file = None
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record(self, op, dst, key):
+        """写入 start/done 记录，key 为 (大小, 修改时间)"""
+        if self._file is None:
+            return
+        with self._lock:
+            try:
+                self._write({'op': op, 'dst': dst, 'size': key[0], 'mtime': key[1]})
+            except OSError as e:
+                print(f"写入归集任务日志失败: {self.path} - {str(e)}")
+
+    def flush(self):
+        if self._file is None:
+            return
+        with self._lock:
+            try:
+                self._file.flush()
+            except OSError as e:
+                print(f"写入归集任务日志失败: {self.path} - {str(e)}")
+
+    def close(self, completed):
+        """关闭日志；任务全部完成时删除日志，否则保留以便下次继续"""
+        if self._file is not None:
+            with contextlib.suppress(OSError):
+                self._file.close()
+            self._file = None
+        if completed:
+            with contextlib.suppress(OSError):
+                os.remove(self.path)
+
+
+
+class ConflictPlanner:
+    """为归集的文件分配目标文件夹中的文件名
+
+    目标文件夹只用 os.scandir 列出一次，之后的冲突检测和重命名都在内存中的文件名集合上进行，
+    同一批文件之间重名也算冲突。文件名按 os.path.normcase 比较，Windows 上不区分大小写。
+    """
+
+    def __init__(self, target_folder):
+        self.existing = set()
+        try:
+            with os.scandir(target_folder) as it:
+                for entry in it:
+                    self.existing.add(os.path.normcase(entry.name))
+        except OSError as e:
+            print(f"读取目标文件夹失败: {target_folder} - {str(e)}")
+
+    def conflicts(self, names):
+        """返回每个文件名的冲突情况：'exists' 目标文件夹中已有，'batch' 与前面的文件重名，None 没有冲突"""
+        seen = set()
+        result = []
+        for name in names:
+            key = os.path.normcase(name)
+            result.append('exists' if key in self.existing else 'batch' if key in seen else None)
+            seen.add(key)
+        return result
+
+    def plan(self, names, actions):
+        """按处理方式分配目标文件名，跳过的文件为 None
+
+        actions 中 'overwrite' 或 None 保留原名，'rename' 改名为 "文件名_n.扩展名"，'skip' 不复制。
+        同一批中已有文件占用了某个名字时，后面保留原名的文件也改名，避免两个文件写入同一位置。
+        每个文件名的序号从上次分配的位置继续，整批只需一遍。
+        """
+        result = [None] * len(names)
+        taken = set(self.existing)
+        claimed = set()
+        renames = []
+        for i, (name, action) in enumerate(zip(names, actions)):
+            if action == 'skip':
+                continue
+            key = os.path.normcase(name)
+            if action == 'rename' or key in claimed:
+                renames.append(i)
+                continue
+            claimed.add(key)
+            taken.add(key)
+            result[i] = name
+        counters = {}   # 文件名 -> (主名, 扩展名, 下一个序号)
+        for i in renames:
+            counter_key = os.path.normcase(names[i])
+            if counter_key in counters:
+                base, ext, counter = counters[counter_key]
+            else:
+                file_path = Path(names[i])
+                base, ext, counter = file_path.stem, file_path.suffix, 1
+            new_name = f"{base}_{counter}{ext}"
+            while os.path.normcase(new_name) in taken:
+                counter += 1
+                new_name = f"{base}_{counter}{ext}"
+            counters[counter_key] = (base, ext, counter + 1)
+            taken.add(os.path.normcase(new_name))
+            result[i] = new_name
+        return result
+
+
+# 重复文件检测
+DEDUP_BLOCK_SIZE = 64 * 1024   # 部分哈希读取的开头和末尾字节数
+
+
+def _open_result(path):
+    """以二进制流打开搜索结果，压缩包成员直接读解压流"""
+    if is_archive_member(path):
+        return open_archive_member(path, seekable=False)
+    return open(path, 'rb')
+
+
+def partial_hash(path, size):
+    """文件开头和末尾各 DEDUP_BLOCK_SIZE 字节的哈希；不超过两块的文件即为全文哈希
+
+    压缩包成员的解压流无法跳到末尾，读完整个流取最后一块，保证内容相同的成员和
+    普通文件得到相同的哈希。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with _open_result(path) as f:
+        digest.update(f.read(DEDUP_BLOCK_SIZE))
+        if size <= DEDUP_BLOCK_SIZE:
+            pass
+        elif size <= 2 * DEDUP_BLOCK_SIZE:
+            digest.update(f.read())
+        elif not is_archive_member(path):
+            f.seek(-DEDUP_BLOCK_SIZE, os.SEEK_END)
+            digest.update(f.read(DEDUP_BLOCK_SIZE))
+        else:
+            tail = b""
+            while True:
+                buf = f.read(COPY_BUFFER_SIZE)
+                if not buf:
+                    break
+                tail = (tail + buf)[-DEDUP_BLOCK_SIZE:]
+            digest.update(tail)
+    return digest.digest()
+
+
+def full_hash(path):
+    """流式计算整个文件的 BLAKE2b 哈希"""
+    digest = hashlib.blake2b()
+    with _open_result(path) as f:
+        while True:
+            buf = f.read(COPY_BUFFER_SIZE)
+            if not buf:
+                break
+            digest.update(buf)
+    return digest.digest()
+
+
+class HashCache:
+    """部分哈希和完整哈希的磁盘缓存，按路径保存并用 (大小, 修改时间) 校验
+
+    只在调用 open() 的线程中使用；同一共享目录再次查找重复文件时大部分文件无需重新读取。
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hashes (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            partial BLOB,
+            full BLOB
+        );
+    """
+    COLUMNS = {'partial': 1, 'full': 2}
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._conn = None
+        self._uncommitted = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+
+    def open(self):
+        if self._conn is not None:
+            return
+        try:
+            db_path = self.db_path or os.path.join(get_cache_dir(), "hash_cache.sqlite3")
+            self._conn = sqlite3.connect(db_path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        except sqlite3.Error as e:
+            print(f"打开哈希缓存失败，不使用缓存: {str(e)}")
+            self._conn = None
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"写入哈希缓存失败: {str(e)}")
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, kind, path, size, mtime):
+        """返回缓存的 kind（'partial' 或 'full'）哈希，未命中或文件已变化时返回 None"""
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute("SELECT size, mtime, partial, full FROM hashes WHERE path = ?",
+                                     (path,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"读取哈希缓存失败: {path} - {str(e)}")
+            row = None
+        if row is not None and row[:2] == (size, mtime) and row[self.COLUMNS[kind] + 1] is not None:
+            self.hits += 1
+            return row[self.COLUMNS[kind] + 1]
+        self.misses += 1
+        return None
+
+    def put(self, kind, path, size, mtime, digest):
+        if self._conn is None:
+            return
+        try:
+            # 文件变化后另一种哈希也随之作废
+            self._conn.execute(
+                f"""INSERT INTO hashes (path, size, mtime, {kind}) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        partial = CASE WHEN size = excluded.size AND mtime = excluded.mtime
+                                       THEN partial ELSE NULL END,
+                        full = CASE WHEN size = excluded.size AND mtime = excluded.mtime
+                                    THEN full ELSE NULL END,
+                        size = excluded.size, mtime = excluded.mtime""",
+                (path, size, mtime, digest))
+            self._conn.execute(f"UPDATE hashes SET {kind} = ? WHERE path = ?", (digest, path))
+        except sqlite3.Error as e:
+            print(f"写入哈希缓存失败: {path} - {str(e)}")
+            return
+        self._uncommitted += 1
+        if self._uncommitted >= 500:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def summary(self):
+        if not self.hits and not self.misses:
+            return ""
+        return f"哈希缓存: 命中 {self.hits}，未命中 {self.misses}"
+
+
+def _hash_file(kind, path, size):
+    return partial_hash(path, size) if kind == 'partial' else full_hash(path)
+
+
+def find_duplicates(files, cancel_event=None, workers=1, cache=None, progress=None):
+    """找出 (路径, 大小, 修改时间) 列表中内容完全相同的文件，返回下标分组，每组至少两个且按原顺序排列
+
+    依次按大小、部分哈希、完整的 BLAKE2 哈希分组，只有上一步仍相同的文件才进入下一步，
+    大多数文件只需比较大小。哈希在 workers 个线程中计算，同时进行的任务数有上限，内存中
+    只保留各文件的哈希值。提供 HashCache 且修改时间不为 None 时先查缓存，算出的哈希写回缓存；
+    缓存只在调用线程中访问。progress(阶段, 已完成数, 总数) 在每个文件之后调用。
+    无法读取的文件（包括损坏的压缩包中的成员）不参与比较，取消时返回空列表。
+    """
+    by_size = {}
+    for i, (_, size, _) in enumerate(files):
+        by_size.setdefault(size, []).append(i)
+    groups = [indices for indices in by_size.values() if len(indices) > 1]
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for kind in ('partial', 'full'):
+            next_groups = []
+            todo = []
+            for indices in groups:
+                # 同组文件大小相同；不超过两块的文件（包括压缩包成员）部分哈希已覆盖全文
+                if kind == 'full' and files[indices[0]][1] <= 2 * DEDUP_BLOCK_SIZE:
+                    next_groups.append(indices)
+                else:
+                    todo.append(indices)
+
+            digests = {}
+            pending = []
+            for indices in todo:
+                for i in indices:
+                    path, size, mtime = files[i]
+                    digest = cache.get(kind, path, size, mtime) if cache is not None and mtime is not None else None
+                    if digest is not None:
+                        digests[i] = digest
+                    else:
+                        pending.append(i)
+            done = len(digests)
+            total = done + len(pending)
+
+            running = {}
+            queue = iter(pending)
+            while True:
+                while len(running) < workers * 4 and not cancelled():
+                    i = next(queue, None)
+                    if i is None:
+                        break
+                    running[pool.submit(_hash_file, kind, files[i][0], files[i][1])] = i
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i = running.pop(future)
+                    path, size, mtime = files[i]
+                    done += 1
+                    try:
+                        digests[i] = future.result()
+                    except Exception as e:
+                        # 损坏的压缩包会抛出 BadZipFile、TarError 等各种异常，该文件不参与比较
+                        print(f"计算文件哈希失败: {path} - {str(e)}")
+                        continue
+                    if cache is not None and mtime is not None:
+                        cache.put(kind, path, size, mtime, digests[i])
+                if progress is not None:
+                    progress(kind, done, total)
+            if cancelled():
+                return []
+
+            for indices in todo:
+                by_digest = {}
+                for i in indices:
+                    if i in digests:
+                        by_digest.setdefault(digests[i], []).append(i)
+                next_groups.extend(same for same in by_digest.values() if len(same) > 1)
+            groups = next_groups
+    return sorted(groups, key=lambda indices: indices[0])
+
+
+class CopyEngine(QThread):
+    """后台复制引擎：线程池同时复制多个文件，按字节汇报进度
+
+    jobs 为 (源路径, 目标路径, 字节数) 列表，最多 workers 个文件同时复制。单个文件失败时
+    最多重试 COPY_RETRIES 次；取消后正在复制的文件被删除，尚未开始的文件不再复制。
+    dedup 为 True 时先用 find_duplicates 找出内容相同的源文件，每组只复制第一个。
+    提供 CopyJournal 时记录每个文件的状态；partial 中的目标文件是上次中断时留下的副本，从中断处继续。
+    """
+    progress = pyqtSignal('qint64', 'qint64', int)  # (已复制字节数, 总字节数, 已处理文件数)
+    files_copied = pyqtSignal(list)                 # 一批复制成功的 (源路径, 目标路径, 复制方式)
+    copy_finished = pyqtSignal(bool, list)          # (是否被取消, 失败文件的说明)
+    duplicates_skipped = pyqtSignal(list)           # 内容重复而未复制的 (源路径, 保留复制的源路径)
+    status_changed = pyqtSignal(str)
+
+    PROGRESS_INTERVAL = 0.2   # 两次汇报进度的最短间隔（秒）
+
+    def __init__(self, jobs, workers=4, dedup=False, journal=None, partial=(), parent=None):
+        super().__init__(parent)
+        self.jobs = list(jobs)
+        self.workers = max(1, workers)
+        self.dedup = dedup
+        self.journal = journal
+        self.partial = set(partial)
+        self.total_bytes = sum(size for _, _, size in self.jobs)
+        self.copied_count = 0
+        self.skipped_count = 0
+        self._copied_bytes = 0
+        self._bytes_lock = threading.Lock()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def add_bytes(self, count):
+        with self._bytes_lock:
+            self._copied_bytes += count
+
+    def copy_file(self, src, dst):
+        """在工作线程中复制一个文件并返回复制方式，失败的尝试已计入的字节数会被扣除"""
+        for attempt in range(COPY_RETRIES + 1):
+            written = 0
+
+            def progress(count):
+                nonlocal written
+                written += count
+                self.add_bytes(count)
+
+            try:
+                if self.journal is not None:
+                    self.journal.record('start', dst, _stat_key(src))
+                method = copy_result_file(src, dst, progress, self._cancel_event, dst in self.partial)
+                if self.journal is not None:
+                    self.journal.record('done', dst, _stat_key(dst))
+                return method
+            except OSError as e:
+                self.add_bytes(-written)
+                if attempt == COPY_RETRIES or isinstance(e, PERMANENT_COPY_ERRORS) or self.is_cancelled():
+                    raise
+                print(f"复制失败，稍后重试: {src} - {str(e)}")
+                time.sleep(COPY_RETRY_DELAY * (attempt + 1))
+            except BaseException:
+                self.add_bytes(-written)
+                raise
+
+    def skip_duplicates(self):
+        self.status_changed.emit("正在查找内容相同的文件...")
+        groups = find_duplicates([(src, size, None) for src, _, size in self.jobs],
+                                 self._cancel_event, self.workers)
+        close_archive_readers()
+        skipped = []
+        duplicate_indices = set()
+        for indices in groups:
+            kept = self.jobs[indices[0]][0]
+            for i in indices[1:]:
+                duplicate_indices.add(i)
+                skipped.append((self.jobs[i][0], kept))
+        if skipped:
+            self.jobs = [job for i, job in enumerate(self.jobs) if i not in duplicate_indices]
+            self.total_bytes = sum(size for _, _, size in self.jobs)
+            self.skipped_count = len(skipped)
+            self.duplicates_skipped.emit(skipped)
+
+    def run(self):
+        if self.dedup:
+            try:
+                self.skip_duplicates()
+            except Exception:
+                # 查重出错时照常复制全部文件，保证复制结束的信号一定发出
+                print(traceback.format_exc())
+        # 跳过的重复文件不写入计划，续传时也不会再复制
+        if self.journal is not None:
+            self.journal.open(self.jobs)
+        errors = []
+        copied = []
+        done = 0
+        last_report = 0.0
+        jobs = iter(self.jobs)
+        running = {}
+        # 压缩包读取器按线程缓存，线程池结束时随线程一起释放
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                # 只提交有限的任务，取消后未提交的文件不再复制
+                while len(running) < self.workers * 2 and not self.is_cancelled():
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    running[pool.submit(self.copy_file, job[0], job[1])] = job
+                if not running:
+                    break
+                finished, _ = wait(running, timeout=self.PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    src, dst, _ = running.pop(future)
+                    done += 1
+                    try:
+                        copied.append((src, dst, future.result()))
+                    except CopyCancelled:
+                        pass
+                    except Exception as e:
+                        errors.append(f"{src} ({str(e)})")
+                now = time.monotonic()
+                if now - last_report >= self.PROGRESS_INTERVAL:
+                    last_report = now
+                    self.report(copied, done)
+                    copied = []
+        self.report(copied, done)
+        if self.journal is not None:
+            self.journal.close(not self.is_cancelled() and not errors)
+        self.copy_finished.emit(self.is_cancelled(), errors)
+
+    def report(self, copied, done):
+        if self.journal is not None:
+            self.journal.flush()
+        self.copied_count += len(copied)
+        if copied:
+            self.files_copied.emit(copied)
+        with self._bytes_lock:
+            copied_bytes = self._copied_bytes
+        self.progress.emit(copied_bytes, self.total_bytes, done)
+
+
+class DuplicateFinder(QThread):
+    """在后台查找搜索结果中内容相同的文件
+
+    entries 为 (存储位置, 路径, 文件名, 大小, 修改时间) 列表，结果为存储位置分组。哈希保存在
+    HashCache 中，文件未修改时再次查找无需重新读取。压缩包内的文件不写入缓存。
+    """
+    status_changed = pyqtSignal(str)
+    finder_finished = pyqtSignal(bool, list)   # (是否被取消, 存储位置分组)
+
+    STAGE_NAMES = {'partial': "比较文件首尾内容", 'full': "计算完整哈希"}
+    STATUS_INTERVAL = 0.2
+
+    def __init__(self, entries, workers=4, parent=None):
+        super().__init__(parent)
+        self.entries = list(entries)
+        self.workers = max(1, workers)
+        self.cache = HashCache()
+        self.reclaimable = 0
+        self._cancel_event = threading.Event()
+        self._last_status = 0.0
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report(self, stage, done, total):
+        now = time.monotonic()
+        if now - self._last_status >= self.STATUS_INTERVAL or done == total:
+            self._last_status = now
+            self.status_changed.emit(f"查找重复文件: {self.STAGE_NAMES[stage]} {done}/{total}")
+
+    def run(self):
+        self.status_changed.emit(f"查找重复文件: 比较 {len(self.entries)} 个文件的大小...")
+        files = [(path, size, None if is_archive_member(path) else mtime)
+                 for _, path, _, size, mtime in self.entries]
+        self.cache.open()
+        try:
+            groups = find_duplicates(files, self._cancel_event, self.workers, self.cache, self.report)
+        finally:
+            self.cache.close()
+            close_archive_readers()
+        self.reclaimable = sum(files[indices[0]][1] * (len(indices) - 1) for indices in groups)
+        self.finder_finished.emit(self.is_cancelled(),
+                                  [[self.entries[i][0] for i in indices] for indices in groups])
+
+
+# 文件删除
+DELETE_CHUNK = 500   # 每个删除任务处理同一目录下最多这么多个文件
+
+
+class Quarantine:
+    """隔离区：删除的文件先改名移入同一卷上的隔离文件夹，清空隔离区时才真正删除，清空前可以恢复
+
+    每次删除为一批，以精确到微秒的删除时间为批次编号。隔离文件夹建在用户选择的搜索文件夹中
+    （文件不在任何搜索文件夹内，或与搜索文件夹不在同一卷上时建在文件所在目录中），不会越过
+    搜索文件夹向上查找；改名不复制数据，瞬间完成。文件在其中保留相对该目录的路径，
+    manifest.jsonl 逐行记录原路径和隔离后的路径。所有隔离文件夹登记在缓存目录的
+    quarantine.jsonl 中。stage() 可以在多个线程中同时调用。
+    """
+    MANIFEST = "manifest.jsonl"
+    BATCH_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+    def __init__(self, roots=(), batch=None):
+        self.roots = {os.path.normcase(os.path.abspath(root)) for root in roots}
+        self.batch = batch or datetime.datetime.now().strftime(self.BATCH_FORMAT)
+        self._tops = {}       # 目录 -> 建立隔离文件夹的目录
+        self._batch_dirs = {}  # 建立隔离文件夹的目录 -> (本批隔离文件夹, manifest 文件)
+        self._lock = threading.Lock()
+
+    def _within_roots(self, directory):
+        key = os.path.normcase(directory)
+        return any(key == root or key.startswith(os.path.join(root, "")) for root in self.roots)
+
+    @staticmethod
+    def registry_path():
+        return os.path.join(get_cache_dir(), "quarantine.jsonl")
+
+    def _top(self, directory):
+        """从 directory 向上找到所在的搜索文件夹，途中遇到其他卷或不可写的目录时停在该处"""
+        top = self._tops.get(directory)
+        if top is None:
+            top = directory
+            parent = os.path.dirname(directory)
+            try:
+                if (os.path.normcase(directory) not in self.roots and parent != directory
+                        and self._within_roots(parent)
+                        and os.stat(parent).st_dev == os.stat(directory).st_dev
+                        and os.access(parent, os.W_OK)):
+                    top = self._top(parent)
+            except OSError:
+                pass
+            self._tops[directory] = top
+        return top
+
+    def _batch_dir(self, top):
+        entry = self._batch_dirs.get(top)
+        if entry is None:
+            batch_dir = os.path.join(top, QUARANTINE_DIR_NAME, self.batch)
+            os.makedirs(os.path.dirname(batch_dir), exist_ok=True)
+            # 批次文件夹必须是新建的，不与其他批次混在一起
+            os.mkdir(batch_dir)
+            manifest = open(os.path.join(batch_dir, self.MANIFEST), 'a', encoding='utf-8')
+            entry = self._batch_dirs[top] = (batch_dir, manifest)
+            with open(self.registry_path(), 'a', encoding='utf-8') as registry:
+                registry.write(json.dumps({'batch': self.batch, 'path': batch_dir}, ensure_ascii=False) + "\n")
+        return entry
+
+    def stage(self, path):
+        """把文件改名移入隔离区，返回隔离后的路径"""
+        # 源文件已不存在时直接失败，不留下空的隔离文件夹
+        os.lstat(path)
+        directory = os.path.dirname(path)
+        with self._lock:
+            top = self._top(directory)
+            try:
+                batch_dir, manifest = self._batch_dir(top)
+            except FileExistsError:
+                raise
+            except OSError:
+                # 上层目录无法建立隔离文件夹时退回到文件所在目录
+                if top == directory:
+                    raise
+                top = self._tops[directory] = directory
+                batch_dir, manifest = self._batch_dir(top)
+        staged = os.path.join(batch_dir, os.path.relpath(path, top))
+        # POSIX 上 rename 会直接替换已有文件，不能覆盖已经隔离的文件
+        if os.path.lexists(staged):
+            raise FileExistsError(errno.EEXIST, "隔离区中已有同名文件", staged)
+        created = []
+        parent = os.path.dirname(staged)
+        while not os.path.isdir(parent):
+            created.append(parent)
+            parent = os.path.dirname(parent)
+        try:
+            os.makedirs(os.path.dirname(staged), exist_ok=True)
+            os.rename(path, staged)
+        except OSError:
+            # 改名失败时删除为它新建的文件夹（从最深一层开始），其他文件已经用到的文件夹保留
+            for folder in created:
+                try:
+                    os.rmdir(folder)
+                except OSError:
+                    break
+            raise
+        with self._lock:
+            manifest.write(json.dumps({'src': path, 'dst': staged}, ensure_ascii=False) + "\n")
+        return staged
+
+    def close(self):
+        with self._lock:
+            for _, manifest in self._batch_dirs.values():
+                with contextlib.suppress(OSError):
+                    manifest.close()
+
+    @staticmethod
+    def _registry_path_of(line):
+        try:
+            return json.loads(line)['path']
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def batches(cls):
+        """返回 {批次编号: [隔离文件夹, ...]}，按批次编号排序，只包含仍然存在的文件夹"""
+        result = {}
+        try:
+            with open(cls.registry_path(), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        batch, path = record['batch'], record['path']
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if os.path.isdir(path) and path not in result.get(batch, ()):
+                        result.setdefault(batch, []).append(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"读取隔离区登记失败: {str(e)}")
+        return dict(sorted(result.items()))
+
+    @classmethod
+    def read_manifest(cls, batch_dir):
+        """返回隔离文件夹中的 [(原路径, 隔离后的路径), ...]"""
+        entries = []
+        try:
+            with open(os.path.join(batch_dir, cls.MANIFEST), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        entries.append((record['src'], record['dst']))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError as e:
+            print(f"读取隔离区清单失败: {batch_dir} - {str(e)}")
+        return entries
+
+    @staticmethod
+    def restore_file(src, staged):
+        """把隔离的文件移回原位置，原位置已有文件时不覆盖"""
+        if os.path.lexists(src):
+            raise FileExistsError(errno.EEXIST, "原位置已存在同名文件", src)
+        os.makedirs(os.path.dirname(src), exist_ok=True)
+        os.rename(staged, src)
+
+    @classmethod
+    def cleanup(cls, batch_dirs, remaining):
+        """恢复或清空之后整理隔离文件夹：remaining 为仍留在隔离区的文件，其余记录从清单中去掉，
+        文件夹中没有剩余文件时连同登记一起删除"""
+        removed = set()
+        for batch_dir in batch_dirs:
+            entries = [(src, dst) for src, dst in cls.read_manifest(batch_dir) if dst in remaining]
+            if entries:
+                try:
+                    with open(os.path.join(batch_dir, cls.MANIFEST), 'w', encoding='utf-8') as f:
+                        for src, dst in entries:
+                            f.write(json.dumps({'src': src, 'dst': dst}, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print(f"更新隔离区清单失败: {batch_dir} - {str(e)}")
+                continue
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            removed.add(batch_dir)
+            # 隔离区中没有其他批次时删除隔离区文件夹本身
+            with contextlib.suppress(OSError):
+                os.rmdir(os.path.dirname(batch_dir))
+        if not removed:
+            return
+        try:
+            with open(cls.registry_path(), 'r', encoding='utf-8') as f:
+                lines = [line for line in f if cls._registry_path_of(line) not in removed]
+            with open(cls.registry_path(), 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+        except OSError as e:
+            print(f"更新隔离区登记失败: {str(e)}")
+
+
+class DeleteEngine(QThread):
+    """后台删除引擎：按目录分组，多个目录同时删除，进度和结果分批回到界面线程
+
+    operation(路径) 完成单个文件的处理：直接删除为 os.remove，移入隔离区为 Quarantine.stage，
+    恢复和清空隔离区也复用本引擎。不事先检查文件是否存在，直接根据操作抛出的错误判断。
+    同一目录的文件在一个任务中依次处理，避免多个线程争用同一目录。全部处理完后在本线程
+    调用 finalize(失败的路径集合)。
+    """
+    progress = pyqtSignal(int, int)        # (已处理文件数, 总文件数)
+    files_deleted = pyqtSignal(list)       # 一批处理成功的路径
+    delete_finished = pyqtSignal(bool, list)  # (是否被取消, 失败文件的说明)
+
+    PROGRESS_INTERVAL = 0.2
+
+    def __init__(self, paths, operation=os.remove, workers=4, finalize=None, parent=None):
+        super().__init__(parent)
+        self.paths = list(paths)
+        self.operation = operation
+        self.workers = max(1, workers)
+        self.finalize = finalize
+        self.deleted_count = 0
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def chunks(self):
+        by_dir = {}
+        for path in self.paths:
+            by_dir.setdefault(os.path.dirname(path), []).append(path)
+        for paths in by_dir.values():
+            for start in range(0, len(paths), DELETE_CHUNK):
+                yield paths[start:start + DELETE_CHUNK]
+
+    def process_chunk(self, paths):
+        """在工作线程中依次处理同一目录下的文件，返回 (成功的路径, 失败文件的说明)"""
+        done, failed = [], []
+        for path in paths:
+            if self.is_cancelled():
+                break
+            try:
+                self.operation(path)
+                done.append(path)
+            except FileNotFoundError:
+                failed.append(f"{path} (文件不存在)")
+            except OSError as e:
+                failed.append(f"{path} ({str(e)})")
+        return done, failed
+
+    def run(self):
+        errors = []
+        succeeded = set()
+        deleted = []
+        processed = 0
+        last_report = 0.0
+        chunks = self.chunks()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                while len(running) < self.workers * 2 and not self.is_cancelled():
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    running[pool.submit(self.process_chunk, chunk)] = chunk
+                if not running:
+                    break
+                finished, _ = wait(running, timeout=self.PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    running.pop(future)
+                    done, failed = future.result()
+                    deleted.extend(done)
+                    if self.finalize is not None:
+                        succeeded.update(done)
+                    processed += len(done) + len(failed)
+                    errors.extend(failed)
+                now = time.monotonic()
+                if now - last_report >= self.PROGRESS_INTERVAL:
+                    last_report = now
+                    self.report(deleted, processed)
+                    deleted = []
+        self.report(deleted, processed)
+        if self.finalize is not None:
+            # 失败的和取消后未处理的文件都还在原处
+            self.finalize(set(self.paths) - succeeded)
+        self.delete_finished.emit(self.is_cancelled(), errors)
+
+    def report(self, deleted, processed):
+        self.deleted_count += len(deleted)
+        if deleted:
+            self.files_deleted.emit(deleted)
+        self.progress.emit(processed, len(self.paths))
+
+
+class ResultModel(QAbstractTableModel):
+    """搜索结果的表格模型，各列分别保存在紧凑的数组中
+
+    同一目录下的结果共用一个目录字符串，大小和修改时间保存在 array 中，显示文本只为
+    可见的行生成。_order 为显示顺序对应的存储位置，排序和删除只改动这个数组。
+    路径到存储位置的索引在第一次按路径删除时建立，之后随追加的行一起维护。
+    迭代模型时按显示顺序逐个产出 {'path', 'name', 'size', 'mod_date'} 字典。
+    show_groups() 之后只显示重复文件，并多出一列重复组编号。
+    """
+    HEADERS = ["文件名", "路径", "大小", "修改日期"]
+    GROUP_HEADER = "重复组"
+    GROUP_COLORS = (QColor(255, 255, 255, 0), QColor(214, 234, 248, 160))
+
+    def __init__(self, format_size, parent=None):
+        super().__init__(parent)
+        self.format_size = format_size
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+        self._reset_storage()
+
+    def _reset_storage(self):
+        self._names = []
+        self._dirs = []             # 目录前缀（含末尾的分隔符），目录前缀 + 文件名即完整路径
+        self._dir_ids = {}
+        self._dir_index = array('I')
+        self._sizes = array('q')
+        self._mtimes = array('d')
+        self._order = array('I')
+        self._path_index = None     # 路径 -> 存储位置，需要时才建立
+        self._group_of = None       # 存储位置 -> 重复组编号，只在显示重复文件时存在
+
+    def __len__(self):
+        return len(self._order)
+
+    def __iter__(self):
+        for i in self._order[:]:
+            yield self._info(i)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS) + (self._group_of is not None)
+
+    # 视图布局时对每一行调用 index() 和 hasChildren()，直接回答可以省去逐行调用 rowCount/columnCount
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self._order) and 0 <= column < self.columnCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def hasChildren(self, parent=QModelIndex()):
+        return not parent.isValid()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section] if section < len(self.HEADERS) else self.GROUP_HEADER
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self._order[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return self._names[i]
+            if column == 1:
+                return os.path.dirname(self._path(i))
+            if column == 2:
+                return self.format_size(self._sizes[i])
+            if column == 3:
+                return datetime.datetime.fromtimestamp(self._mtimes[i]).strftime("%Y-%m-%d")
+            return f"第 {self._group_of[i]} 组"
+        if role == Qt.ToolTipRole and column < 2:
+            return self._names[i] if column == 0 else os.path.dirname(self._path(i))
+        if role == Qt.BackgroundRole and self._group_of is not None:
+            return self.GROUP_COLORS[self._group_of[i] % 2]
+        if role == Qt.UserRole:
+            return self._path(i)
+        return None
+
+    def _path(self, i):
+        return self._dirs[self._dir_index[i]] + self._names[i]
+
+    def _info(self, i):
+        return {
+            'path': self._path(i),
+            'name': self._names[i],
+            'size': self._sizes[i],
+            'mod_date': datetime.datetime.fromtimestamp(self._mtimes[i]).strftime("%Y-%m-%d")
+        }
+
+    def path(self, row):
+        return self._path(self._order[row])
+
+    def entries(self):
+        """按显示顺序产出 (存储位置, 路径, 文件名, 大小, 修改时间)，不生成显示用的日期文本"""
+        for i in self._order[:]:
+            yield i, self._path(i), self._names[i], self._sizes[i], self._mtimes[i]
+
+    def show_groups(self, groups):
+        """只显示 entries() 给出的存储位置分组，同组的文件相邻并标出组号"""
+        self.beginResetModel()
+        self._group_of = {}
+        order = array('I')
+        for number, group in enumerate(groups, 1):
+            for i in group:
+                self._group_of[i] = number
+                order.append(i)
+        self._order = order
+        self.sort_column = None
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._reset_storage()
+        if self.sort_column is not None and self.sort_column >= len(self.HEADERS):
+            self.sort_column = None
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        """追加一批 (路径, 文件名, 大小, 修改时间)，整批只通知视图一次"""
+        if not rows:
+            return
+        first = len(self._order)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        dir_ids = self._dir_ids
+        for path, name, size, mtime in rows:
+            prefix = path[:len(path) - len(name)]
+            dir_id = dir_ids.get(prefix)
+            if dir_id is None:
+                dir_id = dir_ids[prefix] = len(self._dirs)
+                self._dirs.append(prefix)
+            if self._path_index is not None:
+                self._path_index[path] = len(self._names)
+            self._order.append(len(self._names))
+            self._names.append(name)
+            self._dir_index.append(dir_id)
+            self._sizes.append(size)
+            self._mtimes.append(mtime)
+        self.endInsertRows()
+
+    def remove_paths(self, paths):
+        """按路径删除一批结果，每个路径查找一次索引
+
+        被删除的行按连续区间从后往前逐段通知视图，不重置模型，选中项、当前项和滚动位置
+        在删除过程中保持不变。
+        """
+        if self._path_index is None:
+            self._path_index = {self._path(i): i for i in self._order}
+        removed = set()
+        for path in paths:
+            i = self._path_index.pop(path, None)
+            if i is not None:
+                removed.add(i)
+        if not removed:
+            return
+        runs = []
+        for row, i in enumerate(self._order):
+            if i in removed:
+                if runs and runs[-1][1] == row - 1:
+                    runs[-1][1] = row
+                else:
+                    runs.append([row, row])
+        for first, last in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._order[first:last + 1]
+            self.endRemoveRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """按列排序，只重排 _order；搜索过程中追加的行在 resort() 时归位"""
+        if not 0 <= column < self.columnCount():
+            self.sort_column = None
+            return
+        self.sort_column, self.sort_order = column, order
+        names, dirs, dir_index = self._names, self._dirs, self._dir_index
+        key = {
+            0: lambda i: names[i].lower(),
+            1: lambda i: (dirs[dir_index[i]].lower(), names[i].lower()),
+            2: self._sizes.__getitem__,
+            3: self._mtimes.__getitem__,
+            4: lambda i: (self._group_of[i], names[i].lower()),
+        }[column]
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        moved = [self._order[index.row()] for index in persistent]
+        self._order = array('I', sorted(self._order, key=key, reverse=order == Qt.DescendingOrder))
+        if persistent:
+            rows = {i: row for row, i in enumerate(self._order)}
+            self.changePersistentIndexList(
+                persistent, [self.index(rows[i], index.column()) for i, index in zip(moved, persistent)])
+        self.layoutChanged.emit()
+
+    def resort(self):
+        if self.sort_column is not None:
+            self.sort(self.sort_column, self.sort_order)
+
 
 class FileGatherPro(QMainWindow):
+    UI_FLUSH_INTERVAL = 100   # 搜索时界面刷新结果和状态的最短间隔（毫秒）
+    UI_FLUSH_ROWS = 5000      # 缓冲的结果达到此数量时立即刷新
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("文件归集管理器")
@@ -68,14 +3497,26 @@ class FileGatherPro(QMainWindow):
         self.setMaximumWidth(1000)       # 固定宽度
         
         # 初始化变量
-        self.search_results = []
+        self.result_model = ResultModel(self.format_size, self)  # 搜索结果
+        # 搜索结果和当前路径先放入缓冲，由定时器合并刷新到界面
+        self.pending_results = []
+        self.pending_directory = None
+        self.ui_flush_timer = QTimer(self)
+        self.ui_flush_timer.setSingleShot(True)
+        self.ui_flush_timer.timeout.connect(self.flush_search_updates)
         self.target_folder = ""
         self.version = "2.3.4"  # 更新版本号为2.3.4
         self.update_log = "优化搜索结果及按钮显示 (2025-07-17)"
         self.search_folders = []
         self.found_files_count = 0
         self.searching = False
-        self.cancel_search = False
+        self.search_engine = None  # 后台搜索引擎
+        self.copy_engine = None  # 后台复制引擎
+        self.duplicate_finder = None  # 后台重复文件查找
+        self.delete_engine = None  # 后台删除引擎
+        self.copy_started = 0.0
+        self.index_refresher = None  # 后台索引刷新
+        self.extraction_cache = ExtractionCache()  # 内容提取缓存，在多次搜索之间保留
         self.operation_log = []  # 操作日志
         self.operated_files = set()  # 操作过的文件名集合
         self.add_log("启动程序")
@@ -115,7 +3556,7 @@ class FileGatherPro(QMainWindow):
             QPushButton:disabled {
                 background-color: #95a5a6;
             }
-            QTreeWidget {
+            QTreeView {
                 background-color: rgba(255, 255, 255, 200);
                 border: 1px solid #3498db;
                 border-radius: 3px;
@@ -136,7 +3577,7 @@ class FileGatherPro(QMainWindow):
                 background-color: #3498db;
                 width: 10px;
             }
-            QListWidget {
+            QListWidget, QListView {
                 background-color: rgba(255, 255, 255, 200);
                 border: 1px solid #3498db;
                 border-radius: 3px;
@@ -241,7 +3682,7 @@ class FileGatherPro(QMainWindow):
             "- 仅文件名: 只在文件名中匹配关键词\n"
             "- 仅内容: 只在文件内容中匹配关键词\n"
             "- 两者同时: 在文件名或内容中匹配关键词即可\n\n"
-            "注意：内容搜索仅检查文件的前3000个字符"
+            "注意：内容搜索默认检查全文，勾选\"快速内容搜索\"后只检查每个文件的开头部分"
         )
         self.filename_radio.setToolTip(tooltip)
         self.content_radio.setToolTip(tooltip)
@@ -253,6 +3694,53 @@ class FileGatherPro(QMainWindow):
         search_mode_layout.addWidget(self.both_radio)
         search_mode_layout.addStretch(1)
         
+        workers_label = QLabel("内容搜索进程数:")
+        self.content_workers_spin = QSpinBox()
+        self.content_workers_spin.setRange(1, max(1, (os.cpu_count() or 1) * 2))
+        self.content_workers_spin.setValue(max(1, min(8, (os.cpu_count() or 2) - 1)))
+        self.content_workers_spin.setToolTip(
+            "内容搜索时并行解析文件的进程数：\n"
+            "- 1: 在搜索线程中逐个解析\n"
+            "- 大于1: 使用多个进程同时解析PDF/Word/Excel等文件\n\n"
+            "注意：解析出错或超时的文件会被跳过，不影响其余文件的搜索"
+        )
+        search_mode_layout.addWidget(workers_label)
+        search_mode_layout.addWidget(self.content_workers_spin)
+        
+        copy_workers_label = QLabel("复制线程数:")
+        self.copy_workers_spin = QSpinBox()
+        self.copy_workers_spin.setRange(1, 32)
+        self.copy_workers_spin.setValue(4)
+        self.copy_workers_spin.setToolTip(
+            "归集文件时同时复制的文件数：\n"
+            "- 1: 逐个复制\n"
+            "- 大于1: 同时复制多个文件，适合网络共享和SSD上的大量小文件\n\n"
+            f"注意：复制失败的文件会自动重试 {COPY_RETRIES} 次"
+        )
+        search_mode_layout.addWidget(copy_workers_label)
+        search_mode_layout.addWidget(self.copy_workers_spin)
+        
+        self.dedup_check = QCheckBox("跳过重复文件")
+        self.dedup_check.setChecked(True)
+        self.dedup_check.setToolTip(
+            "归集前比较搜索结果的内容，内容完全相同的文件只复制一份：\n"
+            "- 先比较大小，大小相同的再比较开头和末尾部分，最后比较完整的 BLAKE2 哈希\n"
+            "- 跳过的重复文件记录在操作日志中\n\n"
+            "注意：大小相同的文件较多时需要读取文件内容，归集开始前会多花一些时间"
+        )
+        search_mode_layout.addWidget(self.dedup_check)
+        
+        self.quarantine_check = QCheckBox("删除时移入隔离区")
+        self.quarantine_check.setChecked(False)
+        self.quarantine_check.setToolTip(
+            "勾选后删除原文件时先把文件移入所在搜索文件夹中的隔离文件夹，不立即删除：\n"
+            "- 只是改名，不复制数据，大量文件也能瞬间完成\n"
+            "- 移入隔离区的文件仍占用磁盘空间，点击\"隔离区\"按钮可以恢复文件或彻底删除以释放空间\n"
+            f"- 隔离文件夹名为 {QUARANTINE_DIR_NAME}，搜索时自动跳过\n\n"
+            "注意：不勾选（默认）时直接永久删除，不可撤销"
+        )
+        search_mode_layout.addWidget(self.quarantine_check)
+        
         search_layout.addLayout(search_mode_layout)
         
         filetype_layout = QHBoxLayout()
@@ -328,7 +3816,55 @@ class FileGatherPro(QMainWindow):
         
         self.subfolders_check = QCheckBox("包含子文件夹")
         self.subfolders_check.setChecked(True)
-        search_layout.addWidget(self.subfolders_check)
+        
+        self.use_index_check = QCheckBox("使用索引加速重复搜索")
+        self.use_index_check.setChecked(True)
+        self.use_index_check.setToolTip(
+            "包含子文件夹搜索时记录文件夹中所有文件的名称、大小和修改时间：\n"
+            "- 已建立索引的文件夹只重新检查修改过的子文件夹，然后直接查询索引\n"
+            "- 没有索引的文件夹实时遍历，并同时建立索引\n"
+            "- 查询出的文件按实际的大小和修改时间判断条件，原地修改过的文件不会被漏掉\n"
+            f"- 每 {MetadataIndex.FULL_SCAN_AGE // 3600} 小时完整遍历一次，以更新索引中的文件信息\n\n"
+            "注意：索引保存在本机缓存目录中"
+        )
+        
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(self.subfolders_check)
+        options_layout.addWidget(self.use_index_check)
+        
+        self.fulltext_check = QCheckBox("使用全文索引")
+        self.fulltext_check.setChecked(False)
+        self.fulltext_check.setToolTip(
+            "内容搜索时把提取出的文本保存到全文索引：\n"
+            "- 每个文件只提取一次，文件大小或修改时间变化后才重新提取\n"
+            "- 再次搜索内容时直接查询索引，无需重新打开PDF/Word/Excel文件\n"
+            "- 中文按相邻两字建立索引\n\n"
+            "注意：全文索引保存在本机缓存目录中，会占用一定磁盘空间"
+        )
+        options_layout.addWidget(self.fulltext_check)
+        
+        self.fast_content_check = QCheckBox(f"快速内容搜索（前{CONTENT_PREFIX_LIMIT}字符）")
+        self.fast_content_check.setChecked(False)
+        self.fast_content_check.setToolTip(
+            "内容搜索的检查范围：\n"
+            f"- 勾选: 每个文件只检查开头 {CONTENT_PREFIX_LIMIT} 个字符，速度快\n"
+            "- 不勾选: 逐页/逐段/逐行检查全文，确定匹配结果后立即停止读取\n\n"
+            "注意：检查全文时大文件不会一次性读入内存"
+        )
+        options_layout.addWidget(self.fast_content_check)
+        
+        self.archive_check = QCheckBox("搜索压缩包内部")
+        self.archive_check.setChecked(False)
+        self.archive_check.setToolTip(
+            "把 ZIP/tar/7z 压缩包中的文件当作普通文件搜索，不解压到磁盘：\n"
+            "- 结果显示为 \"压缩包路径!/包内路径\"\n"
+            f"- 压缩包中的压缩包最多展开 {ARCHIVE_MAX_DEPTH} 层，超过 {NESTED_ARCHIVE_LIMIT // (1024 * 1024)} MB 的不展开\n"
+            "- 复制时直接从压缩包中解压到目标文件夹\n\n"
+            "注意：7z 压缩包需要安装 py7zr 库，压缩包内的文件不能单独删除"
+        )
+        options_layout.addWidget(self.archive_check)
+        options_layout.addStretch(1)
+        search_layout.addLayout(options_layout)
         
         search_layout.addLayout(date_size_layout)
         
@@ -355,6 +3891,20 @@ class FileGatherPro(QMainWindow):
         self.delete_button.setEnabled(False)
         self.delete_button.clicked.connect(self.delete_files)
         
+        self.duplicates_button = QPushButton("查找重复文件")
+        self.duplicates_button.setEnabled(False)
+        self.duplicates_button.setToolTip(
+            "在当前搜索结果中查找内容完全相同的文件：\n"
+            "- 依次比较大小、文件首尾内容和完整哈希，大多数文件只需比较大小\n"
+            "- 查找完成后结果列表只显示重复文件，同组文件相邻显示\n"
+            "- 哈希保存在本机缓存目录中，文件未修改时再次查找无需重新读取"
+        )
+        self.duplicates_button.clicked.connect(self.find_duplicate_files)
+        
+        self.quarantine_button = QPushButton("隔离区")
+        self.quarantine_button.setToolTip("恢复移入隔离区的文件，或彻底删除以释放磁盘空间")
+        self.quarantine_button.clicked.connect(self.manage_quarantine)
+        
         self.log_button = QPushButton("生成PDF日志")
         self.log_button.setEnabled(True)
         self.log_button.clicked.connect(self.generate_pdf_log)
@@ -367,6 +3917,8 @@ class FileGatherPro(QMainWindow):
         button_layout.addWidget(self.target_button)
         button_layout.addWidget(self.copy_button)
         button_layout.addWidget(self.delete_button)
+        button_layout.addWidget(self.duplicates_button)
+        button_layout.addWidget(self.quarantine_button)
         button_layout.addWidget(self.log_button)
         button_layout.addWidget(self.help_button)
         
@@ -375,12 +3927,20 @@ class FileGatherPro(QMainWindow):
         results_group = QGroupBox("搜索结果")
         results_layout = QVBoxLayout()
         
-        self.results_tree = QTreeWidget()
-        self.results_tree.setHeaderLabels(["文件名", "路径", "大小", "修改日期"])
+        # 结果较多时只为可见的行生成显示内容；点击表头由模型排序
+        self.results_tree = QTreeView()
+        self.results_tree.setModel(self.result_model)
+        self.results_tree.setRootIsDecorated(False)
+        self.results_tree.setUniformRowHeights(True)
         self.results_tree.setColumnWidth(0, 300)
         self.results_tree.setColumnWidth(1, 400)
         self.results_tree.setSelectionMode(QAbstractItemView.ExtendedSelection)
-        self.results_tree.itemDoubleClicked.connect(self.show_file_info)
+        self.results_tree.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_tree.doubleClicked.connect(self.show_file_info)
+        self.results_tree.header().setSectionsClickable(True)
+        self.results_tree.header().setSortIndicatorShown(True)
+        self.results_tree.header().setSortIndicator(-1, Qt.AscendingOrder)
+        self.results_tree.header().sortIndicatorChanged.connect(self.result_model.sort)
         
         self.results_tree.setContextMenuPolicy(Qt.CustomContextMenu)
         self.results_tree.customContextMenuRequested.connect(self.show_context_menu)
@@ -439,10 +3999,12 @@ class FileGatherPro(QMainWindow):
         self.update_folder_list()
     
     def cancel_search_action(self):
-        self.cancel_search = True
-        self.status_label.setText("搜索已取消")
+        if self.search_engine is None:
+            return
+        # 只发出取消请求，界面在搜索线程结束后由 on_search_finished 恢复
+        self.search_engine.cancel()
+        self.status_label.setText("正在取消搜索...")
         self.cancel_button.setEnabled(False)
-        self.search_button.setEnabled(True)
         self.add_log("取消搜索")
     
     def add_search_folder(self):
@@ -451,6 +4013,7 @@ class FileGatherPro(QMainWindow):
             self.search_folders.append(folder)
             self.update_folder_list()
             self.add_log(f"添加搜索文件夹: {folder}", folder)
+            self.schedule_index_refresh([folder])
     
     def add_drive(self):
         drives = [f"{d}:\\" for d in "ABCDEFGHIJKLMNOPQRSTUVWXYZ" if Path(f"{d}:").exists()]
@@ -472,6 +4035,39 @@ class FileGatherPro(QMainWindow):
             self.search_folders.append(drive)
             self.update_folder_list()
             self.add_log(f"添加盘符: {drive}", drive)
+            self.schedule_index_refresh([drive])
+    
+    def schedule_index_refresh(self, folders):
+        """在后台增量刷新文件夹的索引，搜索时即可直接使用"""
+        if not self.use_index_check.isChecked() or self.searching:
+            return
+        if self.index_refresher is not None and self.index_refresher.add_folders(folders):
+            return
+        self.index_refresher = IndexRefresher(self)
+        self.index_refresher.add_folders(folders)
+        self.index_refresher.progress.connect(self.on_index_progress)
+        self.index_refresher.refresh_finished.connect(self.on_index_refreshed)
+        self.index_refresher.start()
+    
+    def stop_index_refresh(self):
+        if self.index_refresher is not None and self.index_refresher.isRunning():
+            self.index_refresher.cancel()
+            self.index_refresher.wait()
+    
+    def on_index_progress(self, path):
+        if not self.searching:
+            self.status_label.setText(f"正在更新索引: {path}")
+    
+    def on_index_refreshed(self, stats):
+        if self.sender() is self.index_refresher:
+            self.index_refresher = None
+        if not stats["checked"]:
+            return
+        summary = (f"检查 {stats['checked']} 个目录，重新列出 {stats['relisted']} 个，"
+                   f"新增 {stats['added']}，更新 {stats['updated']}，删除 {stats['removed']} 个文件")
+        self.add_log(f"更新索引: {summary}")
+        if not self.searching:
+            self.status_label.setText(f"索引已更新: {summary}")
     
     def clear_search_folders(self):
         self.search_folders = []
@@ -496,25 +4092,30 @@ class FileGatherPro(QMainWindow):
         menu.addAction(open_folder_action)
         menu.exec_(self.results_tree.viewport().mapToGlobal(position))
     
+    def selected_result_paths(self):
+        rows = self.results_tree.selectionModel().selectedRows()
+        return [self.result_model.path(index.row()) for index in rows]
+    
     def open_selected_file(self):
-        selected_items = self.results_tree.selectedItems()
-        if not selected_items:
+        selected_paths = self.selected_result_paths()
+        if not selected_paths:
             return
         
-        file_path = selected_items[0].data(0, Qt.UserRole)
+        file_path = selected_paths[0]
         try:
-            os.startfile(file_path)
+            # 压缩包内的文件打开所在的压缩包
+            os.startfile(archive_outer_path(file_path))
             self.add_log(f"打开文件: {file_path}", file_path)
         except Exception as e:
             QMessageBox.warning(self, "错误", f"无法打开文件: {str(e)}")
     
     def open_file_folder(self):
-        selected_items = self.results_tree.selectedItems()
-        if not selected_items:
+        selected_paths = self.selected_result_paths()
+        if not selected_paths:
             return
         
-        file_path = selected_items[0].data(0, Qt.UserRole)
-        folder_path = Path(file_path).parent
+        file_path = selected_paths[0]
+        folder_path = Path(archive_outer_path(file_path)).parent
         
         try:
             os.startfile(str(folder_path))
@@ -531,50 +4132,7 @@ class FileGatherPro(QMainWindow):
             self.add_log(f"设置目标文件夹: {folder}", folder)
     
     def matches_keyword(self, text, keyword):
-        if not keyword:
-            return True
-        
-        exact_matches = re.findall(r'"([^"]*)"', keyword)
-        for exact in exact_matches:
-            if exact.lower() not in text.lower():
-                return False
-            keyword = keyword.replace(f'"{exact}"', '')
-        
-        tokens = re.split(r'\s+', keyword.strip())
-        must_include = []
-        must_exclude = []
-        any_include = []
-        
-        for token in tokens:
-            if not token:
-                continue
-            if token.startswith('+'):
-                must_include.append(token[1:].lower())
-            elif token.startswith('-'):
-                must_exclude.append(token[1:].lower())
-            elif '|' in token:
-                any_include.extend([t.lower() for t in token.split('|')])
-            else:
-                any_include.append(token.lower())
-        
-        for term in must_include:
-            if term not in text.lower():
-                return False
-        
-        for term in must_exclude:
-            if term in text.lower():
-                return False
-        
-        if any_include:
-            found = False
-            for term in any_include:
-                if term in text.lower():
-                    found = True
-                    break
-            if not found:
-                return False
-        
-        return True
+        return compile_keyword(keyword).matches(text)
     
     # 修复1: 使用更可靠的文件占用检测方法
     def is_file_locked(self, filepath):
@@ -597,102 +4155,19 @@ class FileGatherPro(QMainWindow):
             return "both"
         return "filename"
     
-    # 新增内容搜索函数
-    def search_content(self, file_path, keyword):
-        try:
-            file_path = Path(file_path)
-            ext = file_path.suffix.lower()
-            
-            if ext in ['.txt', '.py', '.java', '.cpp', '.h', '.html', '.css', '.js', '.csv', '.ini', '.log']:
-                return self.search_text_file(file_path, keyword)
-            
-            elif ext == '.pdf':
-                return self.search_pdf(file_path, keyword)
-            
-            elif ext in ['.docx']:
-                return self.search_docx(file_path, keyword)
-            
-            elif ext in ['.xlsx']:
-                return self.search_excel(file_path, keyword)
-            
-            else:
-                return False
-                
-        except Exception as e:
-            print(f"内容搜索失败: {file_path} - {str(e)}")
-            return False
-    
-    def search_text_file(self, file_path, keyword):
-        encodings = ['utf-8', 'gbk', 'latin-1']
-        for encoding in encodings:
-            try:
-                with file_path.open('r', encoding=encoding, errors='ignore') as f:
-                    content = f.read(3000)
-                    return self.matches_keyword(content, keyword)
-            except UnicodeDecodeError:
-                continue
-        return False
-    
-    def search_pdf(self, file_path, keyword):
-        try:
-            from fitz import fitz  # 使用PyMuPDF
-            doc = fitz.open(str(file_path))
-            text = ""
-            for page in doc:
-                text += page.get_text()
-                if len(text) > 3000:
-                    break
-            doc.close()
-            return self.matches_keyword(text, keyword)
-        except ImportError:
-            return self.search_text_file(file_path, keyword)
-        except Exception:
-            return False
-    
-    def search_docx(self, file_path, keyword):
-        try:
-            from docx import Document
-            doc = Document(str(file_path))
-            text = ""
-            for para in doc.paragraphs:
-                text += para.text + " "
-                if len(text) > 3000:
-                    break
-            return self.matches_keyword(text, keyword)
-        except ImportError:
-            return self.search_text_file(file_path, keyword)
-        except Exception:
-            return False
-    
-    def search_excel(self, file_path, keyword):
-        try:
-            from openpyxl import load_workbook
-            wb = load_workbook(str(file_path), read_only=True)
-            text = ""
-            for sheet in wb:
-                for row in sheet.iter_rows(values_only=True):
-                    for cell in row:
-                        if cell:
-                            text += str(cell) + " "
-                    if len(text) > 3000:
-                        break
-                if len(text) > 3000:
-                    break
-            wb.close()
-            return self.matches_keyword(text, keyword)
-        except ImportError:
-            return self.search_text_file(file_path, keyword)
-        except Exception:
-            return False
-    
     def start_search(self):
         if not self.search_folders:
             QMessageBox.warning(self, "错误", "请添加至少一个搜索文件夹或盘符！")
             return
         
+        if self.search_engine is not None and self.search_engine.isRunning():
+            return
+        
+        # 搜索线程会自己刷新索引，避免两个线程同时写入
+        self.stop_index_refresh()
+        
         self.search_button.setEnabled(False)
         self.cancel_button.setEnabled(True)
-        self.cancel_search = False
         
         keyword = self.keyword_entry.text()
         file_types = self.filetype_combo.currentData()
@@ -711,145 +4186,115 @@ class FileGatherPro(QMainWindow):
                 return
             file_types = [ext.strip().lower() for ext in custom_types.split(';') if ext.strip()]
         
-        self.search_results = []
-        self.results_tree.clear()
+        self.result_model.clear()
         self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
+        self.progress_bar.setRange(0, 0)  # 单次扫描无法预知总数，显示忙碌状态
         self.found_files_count = 0
         self.status_count_label.setText("已找到: 0 个文件")
         self.status_label.setText("正在搜索文件...")
-        QApplication.processEvents()
+        self.copy_button.setEnabled(False)
+        self.delete_button.setEnabled(False)
+        self.duplicates_button.setEnabled(False)
+        self.quarantine_button.setEnabled(False)
+        self.searching = True
         
         size_range = self.file_size_combo.currentData()
         mod_date_range = self.mod_date_combo.currentData()
         
-        # 单次扫描方案 - 移除预扫描计数
-        processed = 0
-        total_files = 0  # 不再使用总文件数计算进度
-        
-        for folder in self.search_folders:
-            if self.cancel_search:
-                break
-                
-            folder_path = Path(folder)
-            if not folder_path.exists():
-                continue
-                
-            if include_subfolders:
-                walk_iter = os.walk(folder)
-            else:
-                try:
-                    files = [f for f in folder_path.iterdir() if f.is_file()]
-                    walk_iter = [(str(folder_path), [], [f.name for f in files])]
-                except Exception as e:
-                    print(f"访问文件夹出错: {folder} - {str(e)}")
-                    continue
-            
-            for root, _, files in walk_iter:
-                if self.cancel_search:
-                    break
-                    
-                # 更新当前搜索路径显示
-                self.current_path_label.setText(f"当前搜索路径: {root}")
+        # 搜索在后台线程中进行，结果通过信号分批回到界面线程
+        self.search_engine = SearchEngine(
+            self.search_folders, keyword, file_types, include_subfolders, search_mode,
+            size_range, mod_date_range, self.content_workers_spin.value(),
+            self.use_index_check.isChecked(), self.fulltext_check.isChecked(),
+            self.extraction_cache,
+            CONTENT_PREFIX_LIMIT if self.fast_content_check.isChecked() else None,
+            self.archive_check.isChecked(), self
+        )
+        self.search_engine.results_ready.connect(self.on_search_results)
+        self.search_engine.directory_changed.connect(self.on_search_directory)
+        self.search_engine.search_finished.connect(self.on_search_finished)
+        self.search_engine.start()
+    
+    def on_search_results(self, batch):
+        self.pending_results.extend(batch)
+        if len(self.pending_results) >= self.UI_FLUSH_ROWS:
+            self.flush_search_updates()
+        else:
+            self.schedule_search_updates()
+    
+    def on_search_directory(self, root):
+        self.pending_directory = root
+        self.schedule_search_updates()
+    
+    def schedule_search_updates(self):
+        # 定时器只在没有运行时启动，界面每个间隔内最多刷新一次
+        if not self.ui_flush_timer.isActive():
+            self.ui_flush_timer.start(self.UI_FLUSH_INTERVAL)
+    
+    def flush_search_updates(self):
+        """把缓冲的结果一次性加入结果列表，并更新计数和当前路径"""
+        self.ui_flush_timer.stop()
+        if self.pending_results:
+            batch, self.pending_results = self.pending_results, []
+            self.result_model.append_rows(batch)
+            self.found_files_count += len(batch)
+            self.status_count_label.setText(f"已找到: {self.found_files_count} 个文件")
+        if self.pending_directory is not None:
+            root, self.pending_directory = self.pending_directory, None
+            self.current_path_label.setText(f"当前搜索路径: {root}")
+            if self.search_engine is not None and not self.search_engine.is_cancelled():
                 self.status_label.setText(f"正在搜索: {root}")
-                QApplication.processEvents()
-                
-                for file in files:
-                    if self.cancel_search:
-                        break
-                        
-                    file_path = Path(root) / file
-                    
-                    try:
-                        if not file_path.exists() or not os.access(str(file_path), os.R_OK):
-                            continue
-                            
-                        file_stat = file_path.stat()
-                        file_size = file_stat.st_size
-                        mod_date = datetime.datetime.fromtimestamp(file_stat.st_mtime).date()
-                        
-                        if not (size_range[0] <= file_size <= size_range[1]):
-                            continue
-                        
-                        if mod_date_range != (None, None) and mod_date_range != "custom":
-                            start_date, end_date = mod_date_range
-                            if not (start_date <= mod_date <= end_date):
-                                continue
-                        
-                        ext = file_path.suffix.lower()
-                        if file_types and ext not in file_types:
-                            continue
-                        
-                        filename_match = False
-                        content_match = False
-                        
-                        if keyword:
-                            if search_mode in ["filename", "both"]:
-                                filename_match = self.matches_keyword(file, keyword)
-                            
-                            if search_mode in ["content", "both"] and not filename_match:
-                                content_match = self.search_content(str(file_path), keyword)
-                        
-                        if keyword:
-                            if search_mode == "filename":
-                                if not filename_match:
-                                    continue
-                            elif search_mode == "content":
-                                if not content_match:
-                                    continue
-                            elif search_mode == "both":
-                                if not (filename_match or content_match):
-                                    continue
-                        
-                        self.search_results.append({
-                            'path': str(file_path),
-                            'name': file,
-                            'size': file_size,
-                            'mod_date': mod_date.strftime("%Y-%m-%d")
-                        })
-                        
-                        item = QTreeWidgetItem([
-                            file, 
-                            root, 
-                            self.format_size(file_size), 
-                            mod_date.strftime("%Y-%m-%d")
-                        ])
-                        item.setData(0, Qt.UserRole, str(file_path))
-                        item.setToolTip(0, file)
-                        item.setToolTip(1, root)
-                        self.results_tree.addTopLevelItem(item)
-                        
-                        self.found_files_count += 1
-                        # 实时更新找到的文件数量
-                        self.status_count_label.setText(f"已找到: {self.found_files_count} 个文件")
-                        QApplication.processEvents()
-                        
-                    except Exception as e:
-                        print(f"跳过文件 {file_path}，原因: {str(e)}")
-                        continue
-                    
-                    processed += 1
-                    if processed % 100 == 0:
-                        print(f"已处理 {processed} 个文件，当前路径: {root}")  # 调试日志
-                        QApplication.processEvents()  # 仅保持UI响应
-                        if self.cancel_search:
-                            break
-        
+    
+    def on_search_finished(self, cancelled, found_count):
+        self.flush_search_updates()
+        filter_summary = self.search_engine.filter.summary()
+        cache_summary = self.search_engine.cache.summary() if self.search_engine.cache else ""
+        self.searching = False
+        self.search_engine = None
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.setVisible(False)  # 保持进度条隐藏
         self.current_path_label.setText("当前搜索路径: ")
         
-        if self.cancel_search:
+        if cancelled:
             self.status_label.setText(f"搜索已取消，已找到 {self.found_files_count} 个文件")
             self.add_log("搜索已取消")
         else:
             self.status_label.setText(f"搜索完成，找到 {self.found_files_count} 个文件")
             self.add_log(f"搜索完成，找到 {self.found_files_count} 个文件")
         
+        if filter_summary:
+            self.status_label.setText(f"{self.status_label.text()}（{filter_summary}）")
+            self.add_log(f"过滤统计: {filter_summary}")
+        
+        if cache_summary:
+            self.status_label.setText(f"{self.status_label.text()}（{cache_summary}）")
+            self.add_log(cache_summary)
+        
         self.status_count_label.setText(f"已找到: {self.found_files_count} 个文件")
-        self.copy_button.setEnabled(bool(self.search_results))
+        self.result_model.resort()
+        self.copy_button.setEnabled(bool(self.result_model))
+        self.duplicates_button.setEnabled(bool(self.result_model))
+        self.quarantine_button.setEnabled(True)
         self.search_button.setEnabled(True)
         self.cancel_button.setEnabled(False)
     
+    def closeEvent(self, event):
+        # 关闭窗口前停止后台搜索，避免线程在窗口销毁后继续运行
+        if self.search_engine is not None and self.search_engine.isRunning():
+            self.search_engine.cancel()
+            self.search_engine.wait()
+        if self.copy_engine is not None and self.copy_engine.isRunning():
+            self.copy_engine.cancel()
+            self.copy_engine.wait()
+        if self.duplicate_finder is not None and self.duplicate_finder.isRunning():
+            self.duplicate_finder.cancel()
+            self.duplicate_finder.wait()
+        if self.delete_engine is not None and self.delete_engine.isRunning():
+            self.delete_engine.cancel()
+            self.delete_engine.wait()
+        self.stop_index_refresh()
+        super().closeEvent(event)
+    
     def format_size(self, size):
         if size < 1024:
             return f"{size} B"
@@ -861,11 +4306,18 @@ class FileGatherPro(QMainWindow):
             return f"{size/(1024*1024*1024):.2f} GB"
     
     def copy_files(self):
+        # 复制进行中时按钮用于取消
+        if self.copy_engine is not None:
+            self.copy_engine.cancel()
+            self.copy_button.setEnabled(False)
+            self.status_label.setText("正在取消复制...")
+            return
+        
         if not self.target_folder:
             QMessageBox.warning(self, "错误", "请先选择目标文件夹！")
             return
         
-        if not self.search_results:
+        if not self.result_model:
             QMessageBox.warning(self, "错误", "没有可复制的文件！")
             return
         
@@ -877,95 +4329,191 @@ class FileGatherPro(QMainWindow):
         
         target_path.mkdir(parents=True, exist_ok=True)
         
-        existing_files = set()
-        for file_info in self.search_results:
-            target_file = target_path / file_info['name']
-            if target_file.exists():
-                existing_files.add(file_info['name'])
-        
-        if not existing_files:
-            self.copy_files_without_conflicts()
+        # 上次归集中途关闭时留下了任务日志，可以从中断处继续
+        journal = CopyJournal(self.target_folder)
+        if journal.exists():
+            jobs, partial, done = journal.resume_jobs()
+            if jobs:
+                reply = QMessageBox.question(
+                    self, "继续归集",
+                    f"目标文件夹中有未完成的归集任务：已完成 {done} 个文件，剩余 {len(jobs)} 个文件。\n\n"
+                    "是否继续上次的任务？选择\"否\"将放弃上次的任务，重新归集当前搜索结果。",
+                    QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Yes)
+                if reply == QMessageBox.Cancel:
+                    return
+                if reply == QMessageBox.Yes:
+                    self.add_log(f"继续未完成的归集任务，已完成 {done} 个文件，剩余 {len(jobs)} 个文件")
+                    self.start_copy(jobs, journal, partial)
+                    return
+        
+        # 目标文件夹只列出一次，同名检测在内存中进行，搜索结果之间重名也算冲突
+        files = [(path, name, size) for _, path, name, size, _ in self.result_model.entries()]
+        planner = ConflictPlanner(self.target_folder)
+        conflicts = planner.conflicts([name for _, name, _ in files])
+        
+        if not any(conflicts):
+            self.copy_files_without_conflicts(files)
             return
         
-        conflict_dialog = FileConflictDialog(self, self.search_results, self.target_folder)
+        conflict_dialog = FileConflictDialog(self, files, self.target_folder, planner, conflicts)
         if conflict_dialog.exec_() == QDialog.Accepted:
             files_to_copy = conflict_dialog.get_selected_files()
             self.copy_selected_files(files_to_copy)
     
-    def copy_files_without_conflicts(self):
+    def copy_files_without_conflicts(self, files):
+        self.start_copy([(path, os.path.join(self.target_folder, name), size) for path, name, size in files])
+    
+    def copy_selected_files(self, files_to_copy):
+        self.start_copy([(file_info['path'], os.path.join(self.target_folder, file_info['new_name']), file_info['size'])
+                         for file_info in files_to_copy])
+    
+    def start_copy(self, jobs, journal=None, partial=()):
+        """在后台复制 (源路径, 目标路径, 字节数) 列表，进度和结果通过信号回到界面线程
+
+        未提供 journal 时新建任务日志；继续上次的任务时传入已读取的日志和可以续传的目标文件。
+        """
         self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 1000)
         self.progress_bar.setValue(0)
         self.status_label.setText("正在复制文件...")
-        QApplication.processEvents()
-        
-        error_files = []
-        
-        for i, file_info in enumerate(self.search_results):
-            src = Path(file_info['path'])
-            dst = Path(self.target_folder) / file_info['name']
-            
-            try:
-                # 修复2: 直接尝试复制
-                shutil.copy2(str(src), str(dst))
-                self.add_log(f"复制文件到目标文件夹: {dst}", src)
-            except Exception as e:
-                error_files.append(f"{src} ({str(e)})")
-            
-            progress = int((i + 1) / len(self.search_results) * 100)
-            self.progress_bar.setValue(progress)
-            if i % 10 == 0:
-                QApplication.processEvents()
-        
+        self.copy_button.setText("取消归集")
+        self.search_button.setEnabled(False)
+        self.target_button.setEnabled(False)
+        self.delete_button.setEnabled(False)
+        self.duplicates_button.setEnabled(False)
+        self.quarantine_button.setEnabled(False)
+        
+        self.copy_started = time.monotonic()
+        self.copy_engine = CopyEngine(jobs, self.copy_workers_spin.value(), self.dedup_check.isChecked(),
+                                      journal or CopyJournal(self.target_folder), partial, self)
+        self.copy_engine.status_changed.connect(self.status_label.setText)
+        self.copy_engine.duplicates_skipped.connect(self.on_duplicates_skipped)
+        self.copy_engine.progress.connect(self.on_copy_progress)
+        self.copy_engine.files_copied.connect(self.on_files_copied)
+        self.copy_engine.copy_finished.connect(self.on_copy_finished)
+        self.copy_engine.start()
+    
+    def on_copy_progress(self, copied_bytes, total_bytes, done):
+        total_files = len(self.copy_engine.jobs)
+        copied_bytes = min(copied_bytes, total_bytes)
+        if total_bytes:
+            self.progress_bar.setValue(int(copied_bytes * 1000 / total_bytes))
+        elif total_files:
+            self.progress_bar.setValue(int(done * 1000 / total_files))
+        
+        elapsed = time.monotonic() - self.copy_started
+        speed = copied_bytes / elapsed if elapsed > 0 else 0
+        text = (f"正在复制: {done}/{total_files} 个文件，"
+                f"{self.format_size(copied_bytes)}/{self.format_size(total_bytes)}")
+        if speed > 0:
+            remaining = int((total_bytes - copied_bytes) / speed)
+            text += f"，{self.format_size(speed)}/s，剩余约 {remaining // 60:02d}:{remaining % 60:02d}"
+        if not self.copy_engine.is_cancelled():
+            self.status_label.setText(text)
+    
+    def on_files_copied(self, copied):
+        for src, dst, method in copied:
+            self.add_log(f"复制文件到目标文件夹: {dst}（{COPY_METHOD_NAMES.get(method, method)}）", src)
+    
+    def on_duplicates_skipped(self, skipped):
+        for src, kept in skipped:
+            self.add_log(f"跳过重复文件: {src}（与 {kept} 内容相同）", src)
+    
+    def on_copy_finished(self, cancelled, error_files):
+        copied_count = self.copy_engine.copied_count
+        skipped_count = self.copy_engine.skipped_count
+        self.copy_engine = None
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.setVisible(False)
-        
-        if error_files:
+        self.copy_button.setText("开始文件归集")
+        self.copy_button.setEnabled(True)
+        self.search_button.setEnabled(True)
+        self.target_button.setEnabled(True)
+        self.duplicates_button.setEnabled(True)
+        self.quarantine_button.setEnabled(True)
+        
+        if cancelled:
+            self.status_label.setText(f"复制已取消，已复制 {copied_count} 个文件")
+            self.add_log(f"取消复制，已复制 {copied_count} 个文件")
+        elif error_files:
             error_msg = "以下文件复制失败：\n\n" + "\n".join(error_files[:10])
             if len(error_files) > 10:
                 error_msg += f"\n\n...以及另外 {len(error_files)-10} 个文件"
             QMessageBox.warning(self, "复制错误", error_msg)
-            self.status_label.setText(f"已成功复制 {len(self.search_results)-len(error_files)} 个文件，{len(error_files)} 个失败")
+            self.status_label.setText(f"已成功复制 {copied_count} 个文件，{len(error_files)} 个失败")
         else:
-            self.status_label.setText(f"已成功复制 {len(self.search_results)} 个文件到目标文件夹")
+            self.status_label.setText(f"已成功复制 {copied_count} 个文件到目标文件夹")
             self.delete_button.setEnabled(True)
+        if skipped_count:
+            self.status_label.setText(f"{self.status_label.text()}，跳过 {skipped_count} 个重复文件")
     
-    def copy_selected_files(self, files_to_copy):
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
-        self.status_label.setText("正在复制文件...")
-        QApplication.processEvents()
+    def find_duplicate_files(self):
+        # 查找进行中时按钮用于取消
+        if self.duplicate_finder is not None:
+            self.duplicate_finder.cancel()
+            self.duplicates_button.setEnabled(False)
+            self.status_label.setText("正在取消查找...")
+            return
         
-        error_files = []
+        if not self.result_model:
+            QMessageBox.warning(self, "错误", "没有可比较的文件！")
+            return
         
-        for i, file_info in enumerate(files_to_copy):
-            src = Path(file_info['path'])
-            dst = Path(self.target_folder) / file_info['new_name']
-            
-            try:
-                # 修复2: 直接尝试复制
-                shutil.copy2(str(src), str(dst))
-                self.add_log(f"复制文件到目标文件夹: {dst}", src)
-            except Exception as e:
-                error_files.append(f"{src} ({str(e)})")
-            
-            progress = int((i + 1) / len(files_to_copy) * 100)
-            self.progress_bar.setValue(progress)
-            if i % 10 == 0:
-                QApplication.processEvents()
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 0)
+        self.duplicates_button.setText("取消查找")
+        self.search_button.setEnabled(False)
+        self.copy_button.setEnabled(False)
+        self.delete_button.setEnabled(False)
+        self.quarantine_button.setEnabled(False)
+        self.add_log(f"开始查找重复文件，共 {len(self.result_model)} 个文件")
         
+        self.duplicate_finder = DuplicateFinder(self.result_model.entries(), self.copy_workers_spin.value(), self)
+        self.duplicate_finder.status_changed.connect(self.status_label.setText)
+        self.duplicate_finder.finder_finished.connect(self.on_duplicates_found)
+        self.duplicate_finder.start()
+    
+    def on_duplicates_found(self, cancelled, groups):
+        finder, self.duplicate_finder = self.duplicate_finder, None
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.setVisible(False)
+        self.duplicates_button.setText("查找重复文件")
+        self.duplicates_button.setEnabled(True)
+        self.search_button.setEnabled(True)
+        self.copy_button.setEnabled(True)
+        self.quarantine_button.setEnabled(True)
         
-        if error_files:
-            error_msg = "以下文件复制失败：\n\n" + "\n".join(error_files[:10])
-            if len(error_files) > 10:
-                error_msg += f"\n\n...以及另外 {len(error_files)-10} 个文件"
-            QMessageBox.warning(self, "复制错误", error_msg)
-            self.status_label.setText(f"已成功复制 {len(files_to_copy)-len(error_files)} 个文件，{len(error_files)} 个失败")
-        else:
-            self.status_label.setText(f"已成功复制 {len(files_to_copy)} 个文件到目标文件夹")
-            self.delete_button.setEnabled(True)
+        if cancelled:
+            self.status_label.setText("已取消查找重复文件")
+            self.add_log("取消查找重复文件")
+            return
+        
+        # 结果列表只保留重复文件，按组号排列
+        self.result_model.show_groups(groups)
+        self.results_tree.header().setSortIndicator(len(ResultModel.HEADERS), Qt.AscendingOrder)
+        self.found_files_count = len(self.result_model)
+        self.status_count_label.setText(f"已找到: {self.found_files_count} 个文件")
+        self.copy_button.setEnabled(bool(self.result_model))
+        self.duplicates_button.setEnabled(bool(self.result_model))
+        
+        message = (f"找到 {len(groups)} 组重复文件，共 {self.found_files_count} 个文件，"
+                   f"删除重复副本可释放 {self.format_size(finder.reclaimable)}")
+        self.status_label.setText(message)
+        self.add_log(message)
+        cache_summary = finder.cache.summary()
+        if cache_summary:
+            self.status_label.setText(f"{message}（{cache_summary}）")
+            self.add_log(cache_summary)
     
     def delete_files(self):
-        if not self.search_results:
+        # 删除进行中时按钮用于取消
+        if self.delete_engine is not None:
+            self.delete_engine.cancel()
+            self.delete_button.setEnabled(False)
+            self.status_label.setText("正在取消删除...")
+            return
+        
+        if not self.result_model:
             QMessageBox.warning(self, "错误", "没有可删除的文件！")
             return
         
@@ -981,68 +4529,140 @@ class FileGatherPro(QMainWindow):
         
         if reply != QMessageBox.Ok:
             return
-            
+        
+        quarantine = self.quarantine_check.isChecked()
         # 添加确认对话框
-        reply = QMessageBox.question(self, "确认删除", 
-                                    "确定要永久删除原文件吗？此操作不可撤销！",
-                                    QMessageBox.Yes | QMessageBox.No)
-        
-        if reply == QMessageBox.Yes:
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            self.status_label.setText("正在删除文件...")
-            QApplication.processEvents()
-            
-            success_count = 0
-            error_files = []
-            total_files = len(self.search_results)
-            update_interval = max(1, total_files // 50)
-            
-            # 创建临时列表存储删除结果
-            remaining_files = []
-            
-            for i, file_info in enumerate(self.search_results):
-                file_path = Path(file_info['path'])
-                try:
-                    if not file_path.exists():
-                        error_files.append(f"{file_path} (文件不存在)")
-                        remaining_files.append(file_info)
-                        continue
-                        
-                    # 修复3: 使用os.remove直接删除
-                    file_path.unlink()
-                    self.add_log(f"删除文件: {file_path}", file_path)
-                    success_count += 1
-                    
-                    # 从树控件中移除
-                    for index in range(self.results_tree.topLevelItemCount()):
-                        item = self.results_tree.topLevelItem(index)
-                        if item.data(0, Qt.UserRole) == str(file_path):
-                            self.results_tree.takeTopLevelItem(index)
-                            break
-                except Exception as e:
-                    error_files.append(f"{file_path} ({str(e)})")
-                    remaining_files.append(file_info)
-                
-                if i % update_interval == 0 or i == total_files - 1:
-                    progress = int((i + 1) / total_files * 100)
-                    self.progress_bar.setValue(progress)
-                    QApplication.processEvents()
-            
-            # 更新搜索结果列表
-            self.search_results = remaining_files
-            
-            self.progress_bar.setVisible(False)
-            
-            if error_files:
-                error_msg = "以下文件删除失败：\n\n" + "\n".join(error_files[:10])
-                if len(error_files) > 10:
-                    error_msg += f"\n\n...以及另外 {len(error_files)-10} 个文件"
-                QMessageBox.warning(self, "删除错误", 
-                                   f"{error_msg}\n\n请手动删除这些文件。")
-            
-            self.status_label.setText(f"已删除 {success_count}/{total_files} 个文件")
-            self.delete_button.setEnabled(bool(self.search_results))
+        if quarantine:
+            question = "确定要把原文件移入隔离区吗？\n清空隔离区之前，可以通过\"隔离区\"按钮恢复这些文件。"
+        else:
+            question = "确定要永久删除原文件吗？此操作不可撤销！"
+        reply = QMessageBox.question(self, "确认删除", question, QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        
+        self.delete_errors = []
+        paths = []
+        for _, path, _, _, _ in self.result_model.entries():
+            if is_archive_member(path):
+                self.delete_errors.append(f"{path} (压缩包内的文件无法单独删除)")
+            else:
+                paths.append(path)
+        
+        if quarantine:
+            self.delete_quarantine = Quarantine(self.search_folders)
+            operation = self.delete_quarantine.stage
+            self.delete_action = "移入隔离区"
+        else:
+            self.delete_quarantine = None
+            operation = os.remove
+            self.delete_action = "删除"
+        self.start_delete(paths, operation)
+    
+    def start_delete(self, paths, operation, finalize=None):
+        """在后台逐个执行 operation(路径)，处理成功的路径分批从搜索结果中移除并写入日志"""
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(0)
+        self.status_label.setText(f"正在{self.delete_action}...")
+        self.delete_button.setText("取消删除")
+        self.delete_button.setEnabled(True)
+        self.search_button.setEnabled(False)
+        self.copy_button.setEnabled(False)
+        self.duplicates_button.setEnabled(False)
+        self.quarantine_button.setEnabled(False)
+        
+        self.delete_engine = DeleteEngine(paths, operation, self.copy_workers_spin.value(), finalize, self)
+        self.delete_engine.progress.connect(self.on_delete_progress)
+        self.delete_engine.files_deleted.connect(self.on_files_deleted)
+        self.delete_engine.delete_finished.connect(self.on_delete_finished)
+        self.delete_engine.start()
+    
+    def on_delete_progress(self, processed, total):
+        if total:
+            self.progress_bar.setValue(int(processed * 1000 / total))
+        if not self.delete_engine.is_cancelled():
+            self.status_label.setText(f"正在{self.delete_action}: {processed}/{total} 个文件")
+    
+    def on_files_deleted(self, paths):
+        for path in paths:
+            self.add_log(f"文件{self.delete_action}: {path}", path)
+        # 按连续区间移除行，不重置视图
+        self.result_model.remove_paths(paths)
+        self.found_files_count = len(self.result_model)
+        self.status_count_label.setText(f"已找到: {self.found_files_count} 个文件")
+    
+    def on_delete_finished(self, cancelled, error_files):
+        engine, self.delete_engine = self.delete_engine, None
+        if self.delete_quarantine is not None:
+            self.delete_quarantine.close()
+            self.delete_quarantine = None
+        error_files = self.delete_errors + error_files
+        self.delete_errors = []
+        total_files = len(engine.paths)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+        self.delete_button.setText("删除原文件")
+        # 搜索或查找重复文件仍在进行时，由它们结束时恢复按钮
+        idle = not self.searching and self.duplicate_finder is None
+        self.delete_button.setEnabled(idle and bool(self.result_model))
+        self.search_button.setEnabled(idle)
+        self.copy_button.setEnabled(idle and bool(self.result_model))
+        self.duplicates_button.setEnabled(idle and bool(self.result_model))
+        self.quarantine_button.setEnabled(idle)
+        
+        if error_files:
+            error_msg = f"以下文件{self.delete_action}失败：\n\n" + "\n".join(error_files[:10])
+            if len(error_files) > 10:
+                error_msg += f"\n\n...以及另外 {len(error_files)-10} 个文件"
+            QMessageBox.warning(self, "删除错误", error_msg)
+        
+        if cancelled:
+            self.status_label.setText(f"已取消，{engine.deleted_count} 个文件已{self.delete_action}")
+            self.add_log(f"取消{self.delete_action}，已处理 {engine.deleted_count} 个文件")
+        else:
+            self.status_label.setText(f"已{self.delete_action} {engine.deleted_count}/{total_files} 个文件")
+    
+    def manage_quarantine(self):
+        """选择一批隔离的文件，恢复到原位置或彻底删除"""
+        batches = Quarantine.batches()
+        if not batches:
+            QMessageBox.information(self, "隔离区", "隔离区中没有文件。")
+            return
+        
+        labels = []
+        manifests = []
+        for batch, batch_dirs in batches.items():
+            entries = [entry for batch_dir in batch_dirs for entry in Quarantine.read_manifest(batch_dir)]
+            try:
+                batch_time = datetime.datetime.strptime(batch, Quarantine.BATCH_FORMAT).strftime("%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                batch_time = batch
+            labels.append(f"{batch_time} 删除的 {len(entries)} 个文件")
+            manifests.append((batch_dirs, entries))
+        label, ok = QInputDialog.getItem(self, "隔离区", "选择一批隔离的文件：", labels, len(labels) - 1, False)
+        if not ok:
+            return
+        batch_dirs, entries = manifests[labels.index(label)]
+        
+        box = QMessageBox(QMessageBox.Question, "隔离区",
+                          f"{label}\n\n恢复：把文件移回原来的位置\n彻底删除：永久删除这些文件，释放磁盘空间（不可撤销）",
+                          QMessageBox.Cancel, self)
+        restore_button = box.addButton("恢复", QMessageBox.AcceptRole)
+        purge_button = box.addButton("彻底删除", QMessageBox.DestructiveRole)
+        box.exec_()
+        
+        self.delete_errors = []
+        self.delete_quarantine = None
+        if box.clickedButton() == restore_button:
+            # 按原路径处理，日志中记录的是恢复后的位置
+            staged = dict(entries)
+            self.delete_action = "恢复"
+            self.start_delete(staged, lambda src: Quarantine.restore_file(src, staged[src]),
+                              lambda remaining: Quarantine.cleanup(batch_dirs, {staged[src] for src in remaining}))
+        elif box.clickedButton() == purge_button:
+            self.delete_action = "彻底删除"
+            self.start_delete([dst for _, dst in entries], os.remove,
+                              functools.partial(Quarantine.cleanup, batch_dirs))
     
     def _wrap_text(self, text, max_len=40):
         """将长文本自动换行，max_len为每行最大字符数"""
@@ -1115,7 +4735,7 @@ class FileGatherPro(QMainWindow):
                 ["关键词", self.keyword_entry.text() or "无"],
                 ["搜索模式", search_mode_text],
                 ["文件类型", self.filetype_combo.currentText()],
-                ["文件数量", str(len(self.search_results))]
+                ["文件数量", str(len(self.result_model))]
             ]
             info_table = Table(info_data, colWidths=[150, 350])
             info_table.setStyle(TableStyle([
@@ -1172,13 +4792,13 @@ class FileGatherPro(QMainWindow):
                 story.append(Spacer(1, 24))
 
             # 文件列表
-            if self.search_results:
+            if self.result_model:
                 files_title = Paragraph("<b>文件列表</b>", heading_style)
                 story.append(files_title)
                 story.append(Spacer(1, 12))
 
                 file_data = [["文件名", "大小", "修改日期"]]
-                for file_info in self.search_results:
+                for file_info in self.result_model:
                     file_data.append([
                         Paragraph(file_info['name'], normal_style),
                         self.format_size(file_info['size']),
@@ -1237,17 +4857,23 @@ class FileGatherPro(QMainWindow):
             QMessageBox.critical(self, "错误", f"生成PDF日志时出错: {str(e)}")
             print(traceback.format_exc())
     
-    def show_file_info(self, item, column):
-        file_path = item.data(0, Qt.UserRole)
-        if not file_path:
-            return
+    def show_file_info(self, index):
+        path = self.result_model.path(index.row())
         
-        file_path = Path(file_path)
+        # 压缩包内的文件：大小和日期取自压缩包目录，所有者和占用状态取自压缩包本身
+        member = is_archive_member(path)
+        file_path = Path(archive_outer_path(path))
         try:
-            file_stat = file_path.stat()
+            if member:
+                file_stat = archive_member_entry(path)
+                file_name = file_stat.name
+                create_date = "未知"
+            else:
+                file_stat = file_path.stat()
+                file_name = file_path.name
+                create_date = datetime.datetime.fromtimestamp(file_stat.st_ctime).strftime("%Y-%m-%d %H:%M:%S")
             size = self.format_size(file_stat.st_size)
             mod_date = datetime.datetime.fromtimestamp(file_stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-            create_date = datetime.datetime.fromtimestamp(file_stat.st_ctime).strftime("%Y-%m-%d %H:%M:%S")
             
             owner = "未知"
             try:
@@ -1260,14 +4886,11 @@ class FileGatherPro(QMainWindow):
             
             content_preview = ""
             try:
-                encodings = ['utf-8', 'gbk', 'latin-1']
-                for encoding in encodings:
-                    try:
-                        with file_path.open('r', encoding=encoding, errors='ignore') as f:
-                            content_preview = f.read(300)
-                            break
-                    except UnicodeDecodeError:
-                        continue
+                if member:
+                    with open_archive_member(path, seekable=False) as f:
+                        content_preview = read_text_prefix(f, 300)
+                else:
+                    content_preview = read_text_prefix(file_path, 300)
             except:
                 content_preview = "无法预览文件内容"
             
@@ -1278,8 +4901,8 @@ class FileGatherPro(QMainWindow):
             info = f"""
             <b>文件信息</b>
             <table>
-            <tr><td><b>文件名：</b></td><td>{file_path.name}</td></tr>
-            <tr><td><b>路径：</b></td><td>{file_path}</td></tr>
+            <tr><td><b>文件名：</b></td><td>{file_name}</td></tr>
+            <tr><td><b>路径：</b></td><td>{path}</td></tr>
             <tr><td><b>大小：</b></td><td>{size}</td></tr>
             <tr><td><b>修改日期：</b></td><td>{mod_date}</td></tr>
             <tr><td><b>创建日期：</b></td><td>{create_date}</td></tr>
@@ -1291,9 +4914,11 @@ class FileGatherPro(QMainWindow):
             """
             
             QMessageBox.information(self, "文件详情", info)
-            self.add_log(f"查看文件信息: {file_path}", file_path)
+            self.add_log(f"查看文件信息: {path}", path)
         except Exception as e:
             QMessageBox.warning(self, "错误", f"无法获取文件信息: {str(e)}")
+        finally:
+            close_archive_readers()
     
     def show_help(self):
         help_text = f"""
@@ -1323,7 +4948,7 @@ class FileGatherPro(QMainWindow):
             <li><b>开始搜索</b>：点击"开始搜索"按钮执行搜索</li>
             <li><b>选择目标文件夹</b>：点击"选择目标文件夹"按钮指定文件复制位置</li>
             <li><b>复制文件</b>：点击"复制文件到目标文件夹"按钮复制文件</li>
-            <li><b>删除原文件：可选步骤，永久删除原文件（不可撤销）</b></li>
+            <li><b>删除原文件：可选步骤，永久删除原文件（不可撤销）；勾选"删除时移入隔离区"时改为移入隔离区，可以恢复</b></li>
             <li><b>生成PDF日志</b>：创建操作记录PDF文件</li>
         </ol>
         
@@ -1332,10 +4957,22 @@ class FileGatherPro(QMainWindow):
             <li><b>搜索模式选择</b>：灵活选择仅文件名/仅内容/两者同时搜索</li>
             <li><b>多文件夹搜索</b>：支持同时搜索多个文件夹或整个盘符</li>
             <li><b>右键菜单</b>：在搜索结果上右键可打开文件或所在文件夹</li>
+            <li><b>结果排序</b>：点击搜索结果表头按文件名、路径、大小或修改日期排序，数十万条结果也能流畅浏览</li>
             <li><b>冲突处理</b>：自动检测目标文件夹中的同名文件并提供解决方案</li>
+            <li><b>查找重复文件</b>：在搜索结果中找出内容完全相同的文件并按组显示，状态栏显示可释放的空间；文件哈希会被缓存，再次查找几乎无需读取文件</li>
+            <li><b>跳过重复文件</b>：归集时依次比较大小、部分内容和完整哈希，内容完全相同的文件只复制一份，节省复制时间和磁盘空间</li>
+            <li><b>断点续传</b>：归集时在目标文件夹中记录每个文件的复制状态，程序中途关闭后再次归集可从中断处继续，已完成的文件不再复制</li>
+            <li><b>隔离区</b>：勾选"删除时移入隔离区"后，删除原文件时改为移入所在搜索文件夹中的隔离文件夹，瞬间完成，但文件仍占用磁盘空间；之后可通过"隔离区"按钮恢复文件或彻底删除以释放空间，删除在后台多线程进行，可随时取消</li>
+            <li><b>并行复制</b>：可设置复制线程数同时复制多个文件，状态栏显示复制速度和剩余时间，失败的文件自动重试，复制过程中可随时取消</li>
             <li><b>多语言支持</b>：PDF日志支持中文、英文、日文等多种语言</li>
             <li><b>文件占用检测</b>：自动检测并提示被占用的文件</li>
             <li><b>搜索状态显示</b>：实时显示当前搜索的文件夹路径</li>
+            <li><b>文件索引</b>：添加文件夹后在后台建立文件索引，重复搜索同一文件夹时只检查修改过的子文件夹，然后直接查询索引</li>
+            <li><b>多进程内容搜索</b>：可设置内容搜索进程数，多个PDF/Word/Excel文件同时解析，单个文件出错或超时不影响整体搜索</li>
+            <li><b>全文内容搜索</b>：PDF逐页、Word逐段、Excel逐行、文本文件分块读取并检查全文，大文件也不会占用过多内存</li>
+            <li><b>全文索引</b>：勾选后内容搜索会保存提取出的文本，文件未修改时重复搜索直接查询索引，无需重新解析</li>
+            <li><b>内容提取缓存</b>：提取过的文件内容保存在内存和磁盘缓存中，文件未修改时换关键词重新搜索无需再次解析，状态栏显示缓存命中情况</li>
+            <li><b>压缩包内搜索</b>：勾选"搜索压缩包内部"后，ZIP/tar/7z 压缩包中的文件按文件名和内容一起搜索，无需解压，结果显示为"压缩包路径!/包内路径"，复制时直接从压缩包中解压</li>
             <li><b>美观界面</b>：简洁现代的UI设计，包含应用程序图标，可垂直改变窗口大小</li>
         </ul>
         
@@ -1349,8 +4986,8 @@ class FileGatherPro(QMainWindow):
         
         <h3>注意事项</h3>
         <ul>
-            <li>删除操作会永久删除文件，不可撤销</li>
-            <li>内容搜索仅检查文件前3000个字符</li>
+            <li>删除操作会永久删除文件，不可撤销；只有勾选"删除时移入隔离区"时才能恢复</li>
+            <li>内容搜索默认检查全文，勾选"快速内容搜索"后仅检查文件前3000个字符</li>
             <li>本软件仅支持Windows系统</li>
             <li>对于无法访问的文件会自动跳过</li>
         </ul>
@@ -1361,7 +4998,12 @@ class FileGatherPro(QMainWindow):
             <li><b>PDF文档</b>：.pdf（需要安装PyMuPDF库）</li>
             <li><b>Word文档</b>：.docx（需要安装python-docx库）</li>
             <li><b>Excel表格</b>：.xlsx（需要安装openpyxl库）</li>
+            <li><b>演示文稿</b>：.pptx</li>
+            <li><b>OpenDocument文档</b>：.odt, .odp, .ods</li>
+            <li><b>邮件</b>：.eml（主题、收发件人和正文，不含附件）</li>
+            <li><b>压缩包</b>：.zip, .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz, .7z（7z需要安装py7zr库）中的以上格式文件，单个文件不超过64MB</li>
             <li><b>其他文件</b>：跳过内容搜索</li>
+            <li>文本文件最先检查，Word/Excel等文件其次，PDF最后解析；单个文件解析超时会被跳过</li>
         </ul>
         
         <h3>版本更新记录</h3>
@@ -1478,37 +5120,78 @@ class FileGatherPro(QMainWindow):
         help_dialog.setLayout(layout)
         help_dialog.exec_()
     
+class ConflictListModel(QAbstractListModel):
+    """冲突对话框的文件列表，处理方式和分配的文件名保存在列表中，显示文本只为可见的行生成"""
+    ACTION_TEXT = {'overwrite': ("将覆盖", QColor("blue")), 'skip': ("将跳过", QColor("gray"))}
+    CONFLICT_TEXT = {'exists': "存在冲突", 'batch': "与其他文件重名"}
+
+    def __init__(self, names, conflicts, planner, parent=None):
+        super().__init__(parent)
+        self.names = names
+        self.conflicts = conflicts
+        self.planner = planner
+        self.actions = [None] * len(names)
+        self.targets = planner.plan(names, self.actions)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        name, action, target = self.names[row], self.actions[row], self.targets[row]
+        if role == Qt.DisplayRole:
+            if action in self.ACTION_TEXT and target in (None, name):
+                return f"{name} - {self.ACTION_TEXT[action][0]}"
+            if target != name:
+                return f"{name} -> {target}"
+            conflict = self.conflicts[row]
+            return f"{name} - {self.CONFLICT_TEXT[conflict]}" if conflict else name
+        if role == Qt.ForegroundRole:
+            if action in self.ACTION_TEXT and target in (None, name):
+                return self.ACTION_TEXT[action][1]
+            if target != name:
+                return QColor("darkgreen")
+            return QColor("red") if self.conflicts[row] else None
+        return None
+
+    def set_actions(self, rows, action):
+        """修改一批行的处理方式，重新分配整批文件名后刷新视图"""
+        for row in rows:
+            self.actions[row] = action
+        self.targets = self.planner.plan(self.names, self.actions)
+        if self.names:
+            self.dataChanged.emit(self.index(0), self.index(len(self.names) - 1))
+
+
 class FileConflictDialog(QDialog):
-    def __init__(self, parent, files, target_folder):
+    """files 为 (路径, 文件名, 大小) 列表，conflicts 为 ConflictPlanner.conflicts() 的结果"""
+
+    def __init__(self, parent, files, target_folder, planner=None, conflicts=None):
         super().__init__(parent)
         self.setWindowTitle("处理文件冲突")
         self.setGeometry(300, 300, 800, 500)
         
-        self.files = files
+        self.files = list(files)
         self.target_folder = target_folder
-        self.selected_files = []
+        self.planner = planner or ConflictPlanner(target_folder)
+        names = [name for _, name, _ in self.files]
+        if conflicts is None:
+            conflicts = self.planner.conflicts(names)
         
         layout = QVBoxLayout()
         
         title = QLabel("<b>检测到目标文件夹中存在同名文件，请选择处理方式：</b>")
         layout.addWidget(title)
         
-        self.file_list = QListWidget()
+        # 只为可见的行生成显示内容，数十万个文件也能流畅滚动
+        self.file_model = ConflictListModel(names, conflicts, self.planner, self)
+        self.file_list = QListView()
+        self.file_list.setUniformItemSizes(True)
+        self.file_list.setModel(self.file_model)
         self.file_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         
-        for file_info in files:
-            file_name = file_info['name']
-            target_path = Path(target_folder) / file_name
-            
-            conflict = "存在冲突" if target_path.exists() else ""
-            
-            item = QListWidgetItem(f"{file_name} - {conflict}")
-            item.setData(Qt.UserRole, file_info)
-            self.file_list.addItem(item)
-            
-            if conflict:
-                item.setForeground(QColor("red"))
-        
         layout.addWidget(self.file_list)
         
         help_label = QLabel("提示: 选择文件后点击下方按钮设置处理方式")
@@ -1534,7 +5217,7 @@ class FileConflictDialog(QDialog):
         self.auto_rename_button.clicked.connect(self.auto_rename_all)
         
         self.overwrite_all_button = QPushButton("全部覆盖")
-        self.overwrite_all_button.setToolTip("将所有冲突文件全部覆盖")
+        self.overwrite_all_button.setToolTip("将所有冲突文件全部覆盖，与其他文件重名的文件仍会添加后缀")
         self.overwrite_all_button.clicked.connect(self.overwrite_all)
         
         button_layout.addWidget(self.overwrite_button)
@@ -1554,98 +5237,28 @@ class FileConflictDialog(QDialog):
         self.setLayout(layout)
     
     def set_action(self, action):
-        selected_items = self.file_list.selectedItems()
-        if not selected_items:
+        rows = [index.row() for index in self.file_list.selectionModel().selectedIndexes()]
+        if not rows:
             QMessageBox.warning(self, "警告", "请先选择文件！")
             return
-
-        for item in selected_items:
-            file_info = item.data(Qt.UserRole)
-
-            if action == "overwrite":
-                item.setText(f"{file_info['name']} - 将覆盖")
-                item.setForeground(QColor("blue"))
-                file_info['action'] = "overwrite"
-                file_info['new_name'] = file_info['name']
-            elif action == "skip":
-                item.setText(f"{file_info['name']} - 将跳过")
-                item.setForeground(QColor("gray"))
-                file_info['action'] = "skip"
-            elif action == "rename":
-                file_path = Path(file_info['name'])
-                base = file_path.stem
-                ext = file_path.suffix
-                counter = 1
-                new_name = f"{base}_{counter}{ext}"
-                target_path = Path(self.target_folder) / new_name
-                while target_path.exists():
-                    counter += 1
-                    new_name = f"{base}_{counter}{ext}"
-                    target_path = Path(self.target_folder) / new_name
-                item.setText(f"{file_info['name']} -> {new_name}")
-                file_info['action'] = "rename"
-                file_info['new_name'] = new_name
-                item.setForeground(QColor("darkgreen"))
+        self.file_model.set_actions(rows, action)
     
     def auto_rename_all(self):
-        for index in range(self.file_list.count()):
-            item = self.file_list.item(index)
-            file_info = item.data(Qt.UserRole)
-            
-            if "存在冲突" in item.text():
-                file_path = Path(file_info['name'])
-                base = file_path.stem
-                ext = file_path.suffix
-                counter = 1
-                new_name = f"{base}_{counter}{ext}"
-                
-                # 确保新文件名唯一
-                target_path = Path(self.target_folder) / new_name
-                while target_path.exists():
-                    counter += 1
-                    new_name = f"{base}_{counter}{ext}"
-                    target_path = Path(self.target_folder) / new_name
-                
-                item.setText(f"{file_info['name']} -> {new_name}")
-                file_info['action'] = "rename"
-                file_info['new_name'] = new_name
-                item.setForeground(QColor("darkgreen"))
+        self.file_model.set_actions(
+            [row for row, conflict in enumerate(self.file_model.conflicts) if conflict], "rename")
     
     def overwrite_all(self):
-        for index in range(self.file_list.count()):
-            item = self.file_list.item(index)
-            file_info = item.data(Qt.UserRole)
-            item.setText(f"{file_info['name']} - 将覆盖")
-            item.setForeground(QColor("blue"))
-            file_info['action'] = "overwrite"
-            file_info['new_name'] = file_info['name']
+        self.file_model.set_actions(range(len(self.files)), "overwrite")
     
     def get_selected_files(self):
-        result = []
-        for file_info in self.files:
-            action = file_info.get('action', 'overwrite')
-            if action == "skip":
-                continue
-            if action == "rename":
-                if 'new_name' not in file_info:
-                    file_path = Path(file_info['name'])
-                    base = file_path.stem
-                    ext = file_path.suffix
-                    counter = 1
-                    new_name = f"{base}_{counter}{ext}"
-                    target_path = Path(self.target_folder) / new_name
-                    while target_path.exists():
-                        counter += 1
-                        new_name = f"{base}_{counter}{ext}"
-                        target_path = Path(self.target_folder) / new_name
-                    file_info['new_name'] = new_name
-            else:
-                file_info['new_name'] = file_info['name']
-            result.append(file_info)
-        return result
+        """返回要复制的文件 {'path', 'name', 'size', 'new_name'}，跳过的文件不包含在内"""
+        return [{'path': path, 'name': name, 'size': size, 'new_name': new_name}
+                for (path, name, size), new_name in zip(self.files, self.file_model.targets)
+                if new_name is not None]
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包后的程序启动内容搜索子进程时需要
     app = QApplication(sys.argv)
     window = FileGatherPro()
     window.show()
@@ -0,0 +1,33 @@
+"""基准测试公共工具：加载主程序模块、生成测试目录"""
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+APP_FILE = Path(__file__).resolve().parent.parent / "FileGather_Pro2.3.4.py"
+
+
+def load_app():
+    """以模块方式加载主程序（文件名带版本号，无法直接 import）"""
+    if "filegather_app" in sys.modules:
+        return sys.modules["filegather_app"]
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    spec = importlib.util.spec_from_file_location("filegather_app", str(APP_FILE))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["filegather_app"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_tree(base, dirs=50, files_per_dir=200):
+    """在 base 下生成 dirs 个子目录、每个目录 files_per_dir 个小文件"""
+    base = Path(base)
+    names = ["报告", "合同", "report", "summary", "草稿", "invoice"]
+    exts = [".txt", ".docx", ".pdf", ".jpg", ".xlsx", ".log"]
+    for d in range(dirs):
+        folder = base / f"dir_{d:04d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(files_per_dir):
+            name = f"{names[i % len(names)]}_{d}_{i}{exts[i % len(exts)]}"
+            (folder / name).write_text(f"{name} 内容 {i}\n", encoding="utf-8")
+    return dirs * files_per_dir
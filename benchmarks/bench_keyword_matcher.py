@@ -0,0 +1,101 @@
+"""对比 2.3.4 版本 matches_keyword（每次调用都重新解析查询）与预编译的 KeywordMatcher
+
+用法: python benchmarks/bench_keyword_matcher.py [文件名数量]
+"""
+import random
+import re
+import sys
+import time
+
+from _common import load_app
+
+
+def legacy_matches_keyword(text, keyword):
+    """2.3.4 版本 FileGatherPro.matches_keyword 的原样拷贝"""
+    if not keyword:
+        return True
+
+    exact_matches = re.findall(r'"([^"]*)"', keyword)
+    for exact in exact_matches:
+        if exact.lower() not in text.lower():
+            return False
+        keyword = keyword.replace(f'"{exact}"', '')
+
+    tokens = re.split(r'\s+', keyword.strip())
+    must_include = []
+    must_exclude = []
+    any_include = []
+
+    for token in tokens:
+        if not token:
+            continue
+        if token.startswith('+'):
+            must_include.append(token[1:].lower())
+        elif token.startswith('-'):
+            must_exclude.append(token[1:].lower())
+        elif '|' in token:
+            any_include.extend([t.lower() for t in token.split('|')])
+        else:
+            any_include.append(token.lower())
+
+    for term in must_include:
+        if term not in text.lower():
+            return False
+
+    for term in must_exclude:
+        if term in text.lower():
+            return False
+
+    if any_include:
+        found = False
+        for term in any_include:
+            if term in text.lower():
+                found = True
+                break
+        if not found:
+            return False
+
+    return True
+
+
+QUERIES = [
+    "报告",
+    "项目 +最终版 -草稿",
+    "报告|总结|纪要 -草稿",
+    '"季度报告" +2025',
+    "+Contract -draft invoice|receipt|Report",
+]
+
+
+def make_names(count):
+    rng = random.Random(42)
+    words = ["项目", "报告", "最终版", "草稿", "总结", "纪要", "季度报告", "2025", "2024",
+             "Contract", "Draft", "Invoice", "Receipt", "Report", "scan", "IMG"]
+    return [
+        "_".join(rng.choice(words) for _ in range(rng.randint(2, 5))) + rng.choice([".docx", ".pdf", ".txt"])
+        for _ in range(count)
+    ]
+
+
+def main():
+    app = load_app()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    names = make_names(count)
+    print(f"{count} 个文件名，每个查询分别计时")
+    for query in QUERIES:
+        start = time.perf_counter()
+        legacy = [legacy_matches_keyword(name, query) for name in names]
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matcher = app.compile_keyword(query)
+        compiled = [matcher.matches(name) for name in names]
+        compiled_time = time.perf_counter() - start
+
+        assert legacy == compiled, f"结果不一致: {query}"
+        print(f"{query:<42} 旧版 {legacy_time:6.3f}s  预编译 {compiled_time:6.3f}s  "
+              f"加速 {legacy_time / compiled_time:5.1f}x  命中 {sum(compiled)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""对比旧遍历方式（os.walk + exists/access/stat）与 scan_directory 每个文件的文件系统调用次数
+
+用法: python benchmarks/bench_scan_syscalls.py [目录]
+未指定目录时在临时目录中生成 10000 个文件。统计的是 Python 层的 stat/access/scandir 调用；
+在 Windows 上 DirEntry.stat() 复用目录列表数据，不产生额外的系统调用。
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from _common import load_app, make_tree
+
+
+class CountingEntry:
+    """包装 DirEntry，统计 stat() 调用"""
+
+    def __init__(self, entry, counter):
+        self._entry = entry
+        self._counter = counter
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, follow_symlinks=True):
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self._entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self):
+        return self._entry.is_symlink()
+
+    def stat(self, follow_symlinks=True):
+        self._counter["stat"] += 1
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+
+class CountingScandir:
+    def __init__(self, it, counter):
+        self._it = it
+        self._counter = counter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._it.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return CountingEntry(next(self._it), self._counter)
+
+    def close(self):
+        self._it.close()
+
+
+def install_counters(counter):
+    """替换 os 模块中的文件系统函数，返回恢复函数"""
+    originals = {name: getattr(os, name) for name in ("stat", "lstat", "access", "scandir")}
+
+    def counted(name):
+        func = originals[name]
+
+        def wrapper(*args, **kwargs):
+            counter[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    os.stat = counted("stat")
+    os.lstat = counted("lstat")
+    os.access = counted("access")
+
+    def counted_scandir(*args):
+        counter["scandir"] += 1
+        return CountingScandir(originals["scandir"](*args), counter)
+    os.scandir = counted_scandir
+
+    def restore():
+        for name, func in originals.items():
+            setattr(os, name, func)
+    return restore
+
+
+def legacy_walk(folder):
+    """2.3.4 版本 start_search 中的遍历方式"""
+    count = 0
+    for root, _, files in os.walk(folder):
+        for file in files:
+            file_path = Path(root) / file
+            if not file_path.exists() or not os.access(str(file_path), os.R_OK):
+                continue
+            file_stat = file_path.stat()
+            _ = (file_stat.st_size, file_stat.st_mtime)
+            count += 1
+    return count
+
+
+def scandir_walk(app, folder):
+    count = 0
+    for _, entries, _ in app.scan_directory(folder):
+        for entry in entries:
+            file_stat = entry.stat()
+            _ = (file_stat.st_size, file_stat.st_mtime)
+            count += 1
+    return count
+
+
+def run(label, func):
+    counter = Counter()
+    restore = install_counters(counter)
+    try:
+        start = time.perf_counter()
+        files = func()
+        elapsed = time.perf_counter() - start
+    finally:
+        restore()
+    total = sum(counter.values())
+    detail = ", ".join(f"{k}={v}" for k, v in sorted(counter.items()))
+    print(f"{label:<10} 文件 {files:>8}  耗时 {elapsed:7.3f}s  "
+          f"调用 {total:>8} ({detail})  每文件 {total / max(files, 1):.2f} 次")
+
+
+def main():
+    app = load_app()
+    if len(sys.argv) > 1:
+        folder = sys.argv[1]
+        run("os.walk", lambda: legacy_walk(folder))
+        run("scandir", lambda: scandir_walk(app, folder))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        make_tree(tmp, dirs=50, files_per_dir=200)
+        run("os.walk", lambda: legacy_walk(tmp))
+        run("scandir", lambda: scandir_walk(app, tmp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""对比搜索结果缓冲刷新开启与关闭时，界面完成一次文件名搜索的吞吐量（文件/秒）
+
+用法: python benchmarks/bench_ui_updates.py [目录] [关键词]
+未指定目录时在临时目录中生成 500 个目录、共 100000 个文件，关键词默认为 "_"（匹配全部文件）。
+关闭缓冲时搜索线程每个结果、每个目录都发送一次信号，界面收到后立即刷新，相当于旧版本逐个
+添加结果并更新标签的做法。使用 offscreen 平台运行，不显示窗口。
+"""
+import sys
+import tempfile
+import time
+
+from _common import load_app, make_tree
+
+
+def run(app, qt_app, folder, keyword, buffered):
+    engine_cls, window_cls = app.SearchEngine, app.FileGatherPro
+    saved = (engine_cls.BATCH_SIZE, engine_cls.DIRECTORY_INTERVAL,
+             window_cls.UI_FLUSH_INTERVAL, window_cls.UI_FLUSH_ROWS)
+    if not buffered:
+        engine_cls.BATCH_SIZE, engine_cls.DIRECTORY_INTERVAL = 1, 0
+        window_cls.UI_FLUSH_INTERVAL, window_cls.UI_FLUSH_ROWS = 0, 1
+    try:
+        window = window_cls()
+        window.stop_index_refresh()
+        window.search_folders = [folder]
+        window.keyword_entry.setText(keyword)
+        window.filename_radio.setChecked(True)
+        window.use_index_check.setChecked(False)
+        window.show()
+
+        start = time.perf_counter()
+        window.start_search()
+        engine = window.search_engine
+        engine.search_finished.connect(lambda *_: qt_app.quit())
+        qt_app.exec_()
+        elapsed = time.perf_counter() - start
+    finally:
+        (engine_cls.BATCH_SIZE, engine_cls.DIRECTORY_INTERVAL,
+         window_cls.UI_FLUSH_INTERVAL, window_cls.UI_FLUSH_ROWS) = saved
+
+    label = "缓冲刷新" if buffered else "逐个刷新"
+    print(f"{label:<8} 文件 {engine.processed:>8}  结果 {len(window.result_model):>8}  "
+          f"耗时 {elapsed:7.3f}s  吞吐 {engine.processed / elapsed:10.0f} 文件/秒")
+    window.close()
+    return elapsed
+
+
+def main():
+    app = load_app()
+    from PyQt5.QtWidgets import QApplication
+    qt_app = QApplication.instance() or QApplication(sys.argv[:1])
+    keyword = sys.argv[2] if len(sys.argv) > 2 else "_"
+    if len(sys.argv) > 1:
+        folder = sys.argv[1]
+        off = run(app, qt_app, folder, keyword, buffered=False)
+        on = run(app, qt_app, folder, keyword, buffered=True)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_tree(tmp, dirs=500, files_per_dir=200)
+            # 先遍历一遍让目录进入系统缓存，两次计时条件相同
+            for _ in app.scan_directory(tmp):
+                pass
+            off = run(app, qt_app, tmp, keyword, buffered=False)
+            on = run(app, qt_app, tmp, keyword, buffered=True)
+    print(f"加速 {off / on:.1f}x")
+
+
+if __name__ == "__main__":
+    main()